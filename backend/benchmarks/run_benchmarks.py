@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add the source directory to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir / "src"))
+
+from stub_model import write_stub_model
+
+STAGES = ["decode", "blob", "forward", "postprocess", "nms", "annotate", "encode", "pdf"]
+
+
+def summarize(samples_ms):
+    """Mean and percentiles of a list of durations in milliseconds"""
+    samples = np.asarray(samples_ms)
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def synthetic_images(count, width, height, seed=0):
+    """JPEG-encoded synthetic images with some structure for the encoder to work on"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        image = np.full((height, width, 3), rng.integers(0, 255, 3), dtype=np.uint8)
+        for _ in range(20):
+            x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+            cv2.rectangle(image, (x, y), (x + int(rng.integers(10, width // 3)),
+                                          y + int(rng.integers(10, height // 3))),
+                          rng.integers(0, 255, 3).tolist(), -1)
+        noise = rng.integers(0, 20, image.shape, dtype=np.uint8)
+        images.append(cv2.imencode(".jpg", cv2.add(image, noise))[1].tobytes())
+    return images
+
+
+def bench_stages(images, model, input_size, iterations, work_dir):
+    """Time each stage of the single-image detection and report pipeline"""
+    from object_detection import ObjectDetector, draw_annotations
+    from pdf_generator import PDFGenerator
+    from pipeline import detections_to_json
+
+    detector = ObjectDetector(model)
+    pdf_generator = PDFGenerator(work_dir)
+    timings = {stage: [] for stage in STAGES}
+
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage].append((time.perf_counter() - started) * 1000)
+        return result
+
+    for i in range(iterations):
+        contents = images[i % len(images)]
+        image = timed("decode", cv2.imdecode, np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        blob = timed("blob", cv2.dnn.blobFromImage, image, 0.00392, (input_size, input_size),
+                     (0, 0, 0), True, False)
+
+        outs = timed("forward", detector.backend.forward, blob)
+
+        height, width = image.shape[:2]
+        boxes, class_ids, confidences = timed("postprocess", detector._decode,
+                                              [out.reshape(-1, out.shape[-1]) for out in outs],
+                                              width, height)
+        if len(boxes):
+            detections = timed("nms", detector._nms, boxes, class_ids, confidences)
+        else:
+            timings["nms"].append(0.0)
+            detections = ([], [], [])
+
+        annotated = timed("annotate", draw_annotations, image.copy(), *detections, detector.classes)
+        annotated_jpeg = timed("encode", lambda: cv2.imencode(".jpg", annotated)[1].tobytes())
+        timed("pdf", pdf_generator.create_pdf_from_bytes, contents, annotated_jpeg,
+              "benchmark.pdf", detections_to_json(detections, detector.classes))
+
+    return {stage: summarize(samples) for stage, samples in timings.items()}
+
+
+def bench_backends(images, model, input_size, backends, iterations, threads=0):
+    """Forward pass latency of each inference backend on the same images"""
+    from object_detection import ObjectDetector
+
+    decoded = [cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+               for contents in images]
+    results = {}
+    for name in backends:
+        try:
+            detector = ObjectDetector(model, backend=name, threads=threads)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            print(f"  {name:18s} unavailable: {e}")
+            continue
+        detector.warm_up(input_size)
+        samples = []
+        for i in range(iterations):
+            blob = cv2.dnn.blobFromImage(decoded[i % len(decoded)], 0.00392,
+                                         (input_size, input_size), (0, 0, 0), True, False)
+            started = time.perf_counter()
+            detector.backend.forward(blob)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = summarize(samples)
+        print(f"  {name:18s} p50 {results[name]['p50_ms']:9.3f} ms  p95 {results[name]['p95_ms']:9.3f} ms")
+    return results
+
+
+async def bench_endpoint(app, path, images, concurrency, requests):
+    """Send requests to the ASGI app with a fixed number of concurrent clients"""
+    import httpx
+
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client_loop(client):
+        nonlocal errors
+        for i in counter:
+            files = {"file": (f"bench_{i}.jpg", images[i % len(images)], "image/jpeg")}
+            started = time.perf_counter()
+            response = await client.post(path, files=files)
+            latencies.append((time.perf_counter() - started) * 1000)
+            is_json = response.headers.get("content-type") == "application/json"
+            if response.status_code != 200 or (is_json and "error" in response.json()):
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm up so model loading isn't measured
+        await client.post(path, files={"file": ("warmup.jpg", images[0], "image/jpeg")})
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result.update(throughput_rps=round(requests / elapsed, 2), errors=errors)
+    return result
+
+
+def bench_api(images, concurrency_levels, requests):
+    """Throughput and latency of the detection endpoints at several concurrency levels"""
+    import api
+
+    results = {}
+    for path in ["/process-frame/", "/process-image/?persist=false"]:
+        results[path] = {}
+        for concurrency in concurrency_levels:
+            results[path][str(concurrency)] = asyncio.run(
+                bench_endpoint(api.app, path, images, concurrency, requests))
+            print(f"  {path} concurrency={concurrency}: "
+                  f"{results[path][str(concurrency)]['throughput_rps']} req/s")
+    return results, api.batcher.stats()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=backend_dir, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous_path):
+    """Print the change of each stage and endpoint p50 against an earlier result file"""
+    previous = json.loads(Path(previous_path).read_text())
+    print(f"\nComparison with {previous_path} ({previous.get('git_commit')}):")
+    for stage, stats in current["stages"].items():
+        before = previous.get("stages", {}).get(stage)
+        if before and before["p50_ms"]:
+            change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+            print(f"  {stage:12s} p50 {before['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms ({change:+.1f}%)")
+    for path, levels in current.get("api", {}).items():
+        for level, stats in levels.items():
+            before = previous.get("api", {}).get(path, {}).get(level)
+            if before and "throughput_rps" in stats and before.get("throughput_rps"):
+                change = (stats["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+                print(f"  {path} c={level} {before['throughput_rps']} -> "
+                      f"{stats['throughput_rps']} req/s ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline")
+    parser.add_argument("--models-dir", help="Use real models from this directory "
+                                             "instead of a generated stub network")
+    parser.add_argument("--model", default="yolov3")
+    parser.add_argument("--input-size", type=int, default=416)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--iterations", type=int, default=50, help="Iterations per stage")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--backends", default="opencv",
+                        help="Comma separated inference backends to compare "
+                             "(opencv, onnxruntime, onnxruntime-int8)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Threads per forward pass for the backend comparison (0: default)")
+    parser.add_argument("--skip-api", action="store_true", help="Only benchmark pipeline stages")
+    parser.add_argument("--output", help="Result file (default: test_reports/benchmark_<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="yolo_bench_"))
+    models_dir = Path(args.models_dir).resolve() if args.models_dir \
+        else write_stub_model(work_dir / "models")
+    os.environ["YOLO_MODELS_DIR"] = str(models_dir)
+    os.environ["YOLO_TEMP_DIR"] = str(work_dir / "temp")
+    os.environ["YOLO_CACHE_MAX_MB"] = "0"  # every request must run inference
+    os.environ.setdefault("YOLO_IMAGE_MODEL", args.model)
+    os.environ.setdefault("YOLO_FRAME_MODEL", args.model)
+
+    images = synthetic_images(16, args.width, args.height)
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            "model": args.model,
+            "stub_model": not args.models_dir,
+            "input_size": args.input_size,
+            "image_size": [args.width, args.height],
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+    }
+
+    print("Benchmarking pipeline stages...")
+    results["stages"] = bench_stages(images, args.model, args.input_size, args.iterations, work_dir)
+    for stage, stats in results["stages"].items():
+        print(f"  {stage:12s} p50 {stats['p50_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms")
+
+    print("Benchmarking inference backends...")
+    results["backends"] = bench_backends(images, args.model, args.input_size,
+                                         args.backends.split(","), args.iterations, args.threads)
+
+    if not args.skip_api:
+        print("Benchmarking API endpoints...")
+        levels = [int(level) for level in args.concurrency.split(",")]
+        results["api"], results["batching"] = bench_api(images, levels, args.requests)
+
+    output = Path(args.output) if args.output else \
+        backend_dir / "test_reports" / f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nBenchmark results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import numpy as np
+
+# A tiny random-weight network with the same input and output format as
+# YOLOv3 (Darknet cfg with a [yolo] layer and 80 classes), so benchmarks run
+# without downloading the real weights. Its detections are meaningless, but
+# it exercises every stage of the pipeline.
+
+# (input channels, filters, kernel size, stride) of the backbone convolutions
+LAYERS = [(3, 16, 3, 2), (16, 32, 3, 2), (32, 64, 3, 2), (64, 64, 3, 2), (64, 128, 3, 2)]
+NUM_CLASSES = 80
+ANCHORS = "10,14, 23,27, 37,58, 81,82, 135,169, 344,319"
+
+
+def write_stub_model(models_dir, names=("yolov3", "yolov3-tiny"), seed=0):
+    """Write <name>.cfg/<name>.weights for each name plus coco.names into models_dir"""
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    cfg = ["[net]", "width=416", "height=416", "channels=3", ""]
+    params = []
+    for channels, filters, size, stride in LAYERS:
+        cfg += ["[convolutional]", f"filters={filters}", f"size={size}", f"stride={stride}",
+                "pad=1", "activation=leaky", ""]
+        params.append(rng.normal(0, 0.1, filters))
+        params.append(rng.normal(0, np.sqrt(2.0 / (channels * size * size)),
+                                 filters * channels * size * size))
+
+    # Detection head: 3 anchors x (4 box + 1 objectness + classes)
+    outputs = 3 * (5 + NUM_CLASSES)
+    channels = LAYERS[-1][1]
+    cfg += ["[convolutional]", f"filters={outputs}", "size=1", "stride=1", "pad=1",
+            "activation=linear", ""]
+    params.append(rng.normal(-1.0, 1.0, outputs))
+    params.append(rng.normal(0, 0.3, outputs * channels))
+    cfg += ["[yolo]", "mask=0,1,2", f"anchors={ANCHORS}", f"classes={NUM_CLASSES}", "num=6", ""]
+
+    for name in names:
+        (models_dir / f"{name}.cfg").write_text("\n".join(cfg))
+        with open(models_dir / f"{name}.weights", "wb") as f:
+            # Darknet header: major, minor, revision, images seen
+            np.array([0, 2, 0], dtype=np.int32).tofile(f)
+            np.array([0], dtype=np.int64).tofile(f)
+            for p in params:
+                p.astype(np.float32).tofile(f)
+
+    (models_dir / "coco.names").write_text(
+        "\n".join(f"class_{i}" for i in range(NUM_CLASSES)) + "\n")
+    return models_dir
@@ -0,0 +1,165 @@
+import time
+from collections import OrderedDict
+
+# Quality levels from best to cheapest: (frame scale, JPEG quality, input size factor)
+LEVELS = [
+    (0.5, 75, 1.0),
+    (0.5, 70, 0.8),
+    (0.375, 60, 0.7),
+    (0.25, 50, 0.6),
+]
+MAX_SKIP = 4  # process at least one frame in MAX_SKIP + 1
+MIN_INPUT_SIZE = 128
+COOLDOWN_FRAMES = 5  # processed frames between two adjustments
+LATENCY_ALPHA = 0.3  # weight of the newest sample in the latency average
+RELAX_RATIO = 0.6  # step back up once latency is this far under the target
+
+
+class FramePlan:
+    """Settings chosen for one frame of an adaptive session"""
+
+    def __init__(self, skip, scale, quality, input_size):
+        self.skip = skip
+        self.scale = scale
+        self.quality = quality
+        self.input_size = input_size
+
+    def headers(self):
+        return {
+            "X-Frame-Skipped": "1" if self.skip else "0",
+            "X-Frame-Scale": str(self.scale),
+            "X-Frame-Quality": str(self.quality),
+            "X-Frame-Input-Size": str(self.input_size),
+        }
+
+
+class FrameSession:
+    """Adapts scale, JPEG quality and frame skipping for one client
+
+    Each processed frame reports its latency; the smoothed latency is kept
+    under target_ms by stepping down LEVELS first and then skipping frames,
+    and stepping back once there is headroom. Skipped frames reuse the most
+    recent detections. A backed-up inference queue also sheds frames at once.
+    """
+
+    def __init__(self, input_size, target_ms=100):
+        self.base_input_size = input_size
+        self.target = target_ms / 1000
+        self.level = 0
+        self.skip = 0
+        self.latency = None
+        self.last = None  # (detections, scale) of the last processed frame
+        self.tracker = None  # set for sessions with tracking enabled
+        self.last_seen = time.monotonic()
+        self._since_processed = 0
+        self._since_change = 0
+        self._queue_depth = 0
+
+    def _input_size(self, factor):
+        size = int(self.base_input_size * factor) // 32 * 32
+        return min(self.base_input_size, max(MIN_INPUT_SIZE, size))
+
+    def plan(self, queue_depth=0, max_queue=0):
+        """Decide how to handle the next frame"""
+        self._queue_depth = queue_depth
+        scale, quality, factor = LEVELS[self.level]
+
+        skip = False
+        if self.last is not None:
+            saturated = max_queue > 0 and queue_depth >= max(1, max_queue // 2)
+            skip = saturated or self._since_processed < self.skip
+        if skip:
+            self._since_processed += 1
+        else:
+            self._since_processed = 0
+        return FramePlan(skip, scale, quality, self._input_size(factor))
+
+    def record(self, seconds, detections, scale):
+        """Store the result of a processed frame and adapt to its latency"""
+        self.last = (detections, scale)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_ALPHA * (seconds - self.latency)
+
+        self._since_change += 1
+        if self._since_change < COOLDOWN_FRAMES:
+            return
+        if self.latency > self.target or self._queue_depth > 0:
+            if self.level < len(LEVELS) - 1:
+                self.level += 1
+            elif self.skip < MAX_SKIP:
+                self.skip += 1
+            else:
+                return
+        elif self.latency < self.target * RELAX_RATIO:
+            if self.skip > 0:
+                self.skip -= 1
+            elif self.level > 0:
+                self.level -= 1
+            else:
+                return
+        else:
+            return
+        self._since_change = 0
+
+    def stats(self):
+        scale, quality, factor = LEVELS[self.level]
+        return {
+            "level": self.level,
+            "scale": scale,
+            "quality": quality,
+            "input_size": self._input_size(factor),
+            "skip": self.skip,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "tracks": len(self.tracker.tracks) if self.tracker is not None else None,
+        }
+
+
+class FrameSessions:
+    """Adaptive and tracking state per client session, dropped after ttl seconds idle
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, target_ms=100, ttl=300, max_sessions=1024):
+        self.target_ms = target_ms
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # least recently used first
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, model, input_size):
+        """Return the session for this client and model, creating it if needed"""
+        self._expire()
+        key = (session_id, model, input_size)
+        session = self._sessions.get(key)
+        if session is None:
+            session = FrameSession(input_size, self.target_ms)
+            self._sessions[key] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(key)
+        session.last_seen = time.monotonic()
+        return session
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            del self._sessions[key]
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "target_ms": self.target_ms,
+            "clients": {
+                f"{session_id}/{model}/{input_size}": session.stats()
+                for (session_id, model, input_size), session in self._sessions.items()
+            },
+        }
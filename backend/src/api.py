@@ -1,16 +1,49 @@
-from fastapi import FastAPI, File, UploadFile, Response
+from fastapi import (FastAPI, File, UploadFile, Request, Response, Query, Body, WebSocket,
+                     WebSocketDisconnect)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-import shutil
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import os
 from pathlib import Path
+import shutil
 import tempfile
-import cv2
-import numpy as np
-from object_detection import ObjectDetector
-from pdf_generator import PDFGenerator
-import uuid
+import logging
+import time
+import config
+import metrics
+import pipeline
+from adaptive import FrameSessions
+from artifact_store import ArtifactStore
+from batching import MicroBatcher
+from inference_pool import InferencePool, PoolFullError
+from model_manager import ModelManager
+import model_registry
+from report_builder import iter_report, write_report
+from report_jobs import ReportJobs, RESULT_FILENAME
+from result_cache import ResultCache, make_key
+from tiling import tile_grid
+from tracking import Tracker
+from uploads import safe_filename, stored_name, stream_upload
+from video_jobs import VideoJobs, output_names
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Warm up the models in the background while serving; stop workers on shutdown"""
+    warm_up = asyncio.create_task(model_manager.start())
+    sweeper = asyncio.create_task(artifacts.run_sweeper(config.ARTIFACT_SWEEP_INTERVAL))
+    yield
+    warm_up.cancel()
+    sweeper.cancel()
+    videos.shutdown()
+    reports.shutdown()
+    inference_pool.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -21,98 +54,761 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize object detector
-detector = ObjectDetector()
+def _preload_models():
+    """(model, input_size) pairs warmed up on every worker, at the size each endpoint uses"""
+    sizes = {config.FRAME_MODEL: config.FRAME_INPUT_SIZE, config.IMAGE_MODEL: config.IMAGE_INPUT_SIZE}
+    return [(name, sizes.get(name)) for name in dict.fromkeys(config.PRELOAD_MODELS)]
+
+# Initialize inference workers; each worker loads its own detector when it starts
+inference_pool = InferencePool(
+    workers=config.INFERENCE_WORKERS,
+    max_queue=config.INFERENCE_QUEUE_SIZE,
+    mode=config.INFERENCE_MODE,
+    preload=_preload_models(),
+)
+model_manager = ModelManager(inference_pool)
+
+# Requests arriving within a short window share one forward pass
+batcher = MicroBatcher(
+    inference_pool,
+    max_batch=config.MAX_BATCH_SIZE,
+    max_wait_ms=config.MAX_BATCH_WAIT_MS,
+)
+
+# Per-request files, removed when they expire or the store is full
+artifacts = ArtifactStore(
+    config.TEMP_DIR,
+    ttl=config.ARTIFACT_TTL,
+    max_bytes=config.ARTIFACT_MAX_MB * 1024 * 1024,
+)
+
+# PDF reports are built off the request path
+reports = ReportJobs(artifacts)
+
+# Uploaded videos are processed frame by frame in the background
+videos = VideoJobs(artifacts, inference_pool, workers=config.VIDEO_WORKERS,
+                   batch_size=config.VIDEO_BATCH_SIZE)
+
+# Requests with a running job are never swept; removed ones are forgotten
+artifacts.busy_checks += [reports.active, videos.active]
+artifacts.delete_hooks += [reports.forget, videos.forget]
+
+# Results of repeated uploads are served without running inference
+result_cache = ResultCache(
+    max_bytes=config.CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=config.CACHE_DIR or None,
+    disk_max_bytes=config.CACHE_DISK_MAX_MB * 1024 * 1024,
+)
+
+# Files of a /process-images/ request with report=true
+BATCH_DETECTIONS_FILENAME = "detections.jsonl"
+BATCH_REPORT_FILENAME = "batch_report.pdf"
+
+# Per-client state for adaptive and tracked /process-frame/ requests
+frame_sessions = FrameSessions(
+    target_ms=config.FRAME_TARGET_MS,
+    ttl=config.FRAME_SESSION_TTL,
+)
+
+# Request and pipeline metrics exported at /metrics
+REQUESTS = metrics.Counter("http_requests_total", "HTTP requests by method, route and status")
+REQUEST_SECONDS = metrics.Histogram("http_request_duration_seconds", "HTTP request latency by route")
+ERRORS = metrics.Counter("yolo_errors_total", "Failed detection requests by endpoint")
+FRAMES_IN_FLIGHT = metrics.Gauge("yolo_frames_in_flight", "Camera frames currently being processed")
+FRAMES_DROPPED = metrics.Counter("yolo_frames_dropped_total",
+                                 "Streamed frames replaced by a newer one before processing")
+FRAMES_SKIPPED = metrics.Counter("yolo_frames_skipped_total",
+                                 "Adaptive-session frames answered with the previous detections")
+FRAMES_TRACKED = metrics.Counter("yolo_frames_tracked_total",
+                                 "Tracked frames answered by propagating boxes without detection")
+metrics.Gauge("yolo_frame_sessions", "Active adaptive frame sessions",
+              function=lambda: len(frame_sessions))
+metrics.Gauge("yolo_inference_queue_depth", "Jobs waiting for a free inference worker",
+              function=lambda: inference_pool.queue_depth)
+metrics.Gauge("yolo_inference_in_flight", "Jobs running or waiting on inference workers",
+              function=lambda: inference_pool.in_flight)
+metrics.Counter("yolo_cache_hits_total", "Result cache hits", function=lambda: result_cache.hits)
+metrics.Counter("yolo_cache_misses_total", "Result cache misses", function=lambda: result_cache.misses)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Count requests, time them and report stage timings in a Server-Timing header"""
+    started = time.perf_counter()
+    with metrics.collect_timings() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
 
-# Create temp directory for processed files
-TEMP_DIR = Path("temp")
-TEMP_DIR.mkdir(exist_ok=True)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    REQUESTS.inc(method=request.method, path=path, status=response.status_code)
+    REQUEST_SECONDS.observe(elapsed, path=path)
+
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings + [("total", elapsed)])
+    return response
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/process-image/")
-async def process_image(file: UploadFile = File(...)):
-    # Create unique ID for this request
-    request_id = str(uuid.uuid4())
-    request_dir = TEMP_DIR / request_id
-    request_dir.mkdir(exist_ok=True)
+async def process_image(
+    file: UploadFile = File(...),
+    model: str = config.IMAGE_MODEL,
+    input_size: int = Query(config.IMAGE_INPUT_SIZE, ge=32, le=1920),
+    conf_threshold: float = Query(0.5, ge=0, le=1),
+    nms_threshold: float = Query(0.4, ge=0, le=1),
+    per_class_nms: bool = False,
+    persist: bool = True,
+    report: str = Query("background", pattern="^(background|lazy)$"),
+    tiled: bool = False,
+    tile_size: int = Query(config.TILE_SIZE, ge=0, le=4096),
+    tile_overlap: float = Query(config.TILE_OVERLAP, ge=0, lt=0.9),
+):
+    """Detect objects in an uploaded image
+
+    With persist=false only the detections are returned and nothing is
+    written to disk; otherwise the original and annotated image are stored
+    for download. The PDF report is built in the background (report=lazy
+    defers it until it is first downloaded); its progress is available at
+    /report-status/{request_id}.
+
+    tiled=true detects objects in overlapping tiles of tile_size pixels
+    (default: the network input size) and merges them, so small objects in
+    large images are not lost to downscaling.
+    """
+    try:
+        model, input_size = model_registry.resolve(model, input_size)
+        classes = model_registry.get_classes(model)
+    except Exception as e:
+        return {"error": str(e)}
 
     try:
-        # Save uploaded file
-        input_path = request_dir / file.filename
-        with input_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with metrics.stage("upload"):
+            contents = await file.read()
+        filename = safe_filename(file.filename)
+
+        # Identical uploads with identical settings reuse the earlier result
+        tiling = None
+        if tiled:
+            # Tiles much smaller than the network input only multiply the work
+            min_tile_size = max(32, input_size // 2)
+            if tile_size and tile_size < min_tile_size:
+                return {"error": f"tile_size must be 0 or at least {min_tile_size}"}
+            tiling = {"tile_size": tile_size, "overlap": tile_overlap,
+                      "batch_size": config.TILE_BATCH_SIZE,
+                      "max_tiles": config.TILE_MAX_TILES}
+        cache_key, cached = await _cache_lookup(
+            contents, endpoint="image", model=model, input_size=input_size,
+            conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+            per_class_nms=per_class_nms, tiling=tiling)
 
-        # Read and process image
-        image = cv2.imread(str(input_path))
-        boxes, class_ids, confidences = detector.detect_objects(image)
-        annotated_image = detector.draw_annotations(image, boxes, class_ids, confidences)
+        if cached is not None:
+            # Reuse the detections; each caller still gets a request of its own
+            detections_json, annotated_jpeg = cached["detections"], cached["annotated"]
+        else:
+            # Decode the upload in memory
+            image = await run_in_threadpool(pipeline.decode_image, contents)
+            if image is None:
+                return {"error": "Invalid image data"}
 
-        # Save annotated image
-        annotated_path = request_dir / f"annotated_{file.filename}"
-        cv2.imwrite(str(annotated_path), annotated_image)
+            options = dict(conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                           per_class_nms=per_class_nms)
+            if tiling:
+                tiles = len(tile_grid(*image.shape[:2], tile_size or input_size, tile_overlap))
+                if tiles > config.TILE_MAX_TILES:
+                    return {"error": f"Image needs {tiles} tiles, more than the limit of "
+                                     f"{config.TILE_MAX_TILES}; use a larger tile_size"}
+                # Tiles are already batched, so they bypass the micro-batcher
+                detections = await inference_pool.run(
+                    pipeline.detect_tiled, image, options, input_size, tiling, model=model)
+            else:
+                detections = await batcher.detect(image, model, input_size, **options)
+            detections_json = pipeline.detections_to_json(detections, classes)
 
-        # Generate PDF
-        pdf_generator = PDFGenerator(request_dir)
-        pdf_path = request_dir / f"{file.filename}_report.pdf"
-        pdf_generator.create_pdf(input_path, annotated_path, pdf_path.name)
+            # Encode the annotated image once; the upload is stored as-is
+            annotated_jpeg = None
+            if persist or cache_key:
+                annotated_jpeg = await run_in_threadpool(
+                    pipeline.encode_annotated, image, detections, classes)
+            if cache_key:
+                await run_in_threadpool(result_cache.put, cache_key,
+                                        {"detections": detections_json, "annotated": annotated_jpeg})
 
-        return {
+        result = {"filename": filename, "detections": detections_json}
+        if cached is not None:
+            result["cached"] = True
+        if not persist:
+            return result
+
+        # Create unique ID for this request
+        request_id, request_dir = artifacts.create()
+
+        result.update({
             "request_id": request_id,
-            "filename": file.filename,
-            "annotated_filename": f"annotated_{file.filename}",
-            "pdf_filename": pdf_path.name
-        }
+            "model": model,
+            "original_filename": stored_name(filename),
+            "annotated_filename": f"annotated_{Path(filename).stem}.jpg",
+            "pdf_filename": f"{filename}_report.pdf",
+        })
+        with metrics.stage("write"):
+            await run_in_threadpool(_save_artifacts, request_dir, {
+                result["original_filename"]: contents,
+                result["annotated_filename"]: annotated_jpeg,
+                RESULT_FILENAME: json.dumps(result).encode(),
+            })
+        # The report of an identical earlier request is reused if it is finished
+        report_reused = False
+        if cached is not None and cached.get("request_id"):
+            report_reused = await run_in_threadpool(
+                _reuse_report, cached["request_id"], request_dir, result["pdf_filename"])
+        artifacts.refresh(request_id)
+        if cache_key:
+            await run_in_threadpool(result_cache.update, cache_key, request_id=request_id)
+
+        # Generate PDF without holding up the response
+        if report == "background" and not report_reused:
+            reports.submit(request_id)
+
+        return result
+
+    except PoolFullError as e:
+        return _busy_response(e)
+    except Exception as e:
+        logger.error(f"Error processing image: {e}")
+        ERRORS.inc(endpoint="process-image")
+        return {"error": str(e)}
+
+async def _cache_lookup(contents, **settings):
+    """Return (key, cached entry or None); the key is None if caching is off"""
+    if not result_cache.enabled:
+        return None, None
+    with metrics.stage("cache"):
+        key = await run_in_threadpool(make_key, contents, **settings)
+        return key, await run_in_threadpool(result_cache.get, key)
 
+def _save_artifacts(request_dir, files):
+    """Write each named file's bytes into the request directory"""
+    for name, data in files.items():
+        (request_dir / name).write_bytes(data)
+
+def _reuse_report(source_id, request_dir, pdf_filename):
+    """Hard-link (or copy) the finished report of another request; False if there is none"""
+    try:
+        status = reports.status(source_id)
+        if status["status"] != "done":
+            return False
+        source = artifacts.path(source_id) / status["pdf_filename"]
+        target = request_dir / pdf_filename
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        return True
+    except (OSError, ValueError):
+        return False
+
+@app.post("/process-images/")
+async def process_images(
+    files: list[UploadFile] = File(...),
+    model: str = config.IMAGE_MODEL,
+    input_size: int = Query(config.IMAGE_INPUT_SIZE, ge=32, le=1920),
+    conf_threshold: float = Query(0.5, ge=0, le=1),
+    nms_threshold: float = Query(0.4, ge=0, le=1),
+    per_class_nms: bool = False,
+    report: bool = False,
+):
+    """Detect objects in many uploaded images, streaming the results as NDJSON
+
+    Uploads are decoded concurrently and detected through the micro-batcher,
+    so they share forward passes. A line with the index, filename and
+    detections (or an error) is sent for each image as soon as it is done,
+    in completion order. The last line has "done": true and the counts;
+    with report=true the annotated images are stored and the last line also
+    carries the request_id and pdf_filename of a combined report.
+    """
+    try:
+        model, input_size = model_registry.resolve(model, input_size)
+        classes = model_registry.get_classes(model)
     except Exception as e:
         return {"error": str(e)}
 
+    request_id = request_dir = None
+    if report:
+        request_id, request_dir = artifacts.create()
+    options = dict(conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                   per_class_nms=per_class_nms)
+    # Bounds the decoded images held at once to about two batches
+    in_progress = asyncio.Semaphore(config.MAX_BATCH_SIZE * 2)
+
+    async def detect(index, file):
+        filename = safe_filename(file.filename)
+        async with in_progress:
+            try:
+                with metrics.stage("upload"):
+                    contents = await file.read()
+                await file.close()
+                image = await run_in_threadpool(pipeline.decode_image, contents)
+                if image is None:
+                    raise ValueError("Invalid image data")
+                # Wait a while for room in a busy pool rather than failing the image at once
+                deadline = time.monotonic() + config.BATCH_BUSY_TIMEOUT
+                while True:
+                    try:
+                        detections = await batcher.detect(image, model, input_size, **options)
+                        break
+                    except PoolFullError:
+                        if time.monotonic() >= deadline:
+                            raise RuntimeError("Server busy, try again later")
+                        await asyncio.sleep(0.05)
+                result = {"index": index, "filename": filename,
+                          "detections": pipeline.detections_to_json(detections, classes)}
+                if request_dir is not None:
+                    result["annotated_filename"] = f"annotated_{index}_{Path(filename).stem}.jpg"
+                    annotated_jpeg = await run_in_threadpool(
+                        pipeline.encode_annotated, image, detections, classes)
+                    with metrics.stage("write"):
+                        await run_in_threadpool(_save_artifacts, request_dir,
+                                                {result["annotated_filename"]: annotated_jpeg})
+                return result
+            except Exception as e:
+                logger.error(f"Error processing {filename}: {e}")
+                ERRORS.inc(endpoint="process-images")
+                return {"index": index, "filename": filename, "error": str(e)}
+
+    async def results():
+        tasks = [asyncio.ensure_future(detect(index, file)) for index, file in enumerate(files)]
+        done = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                done.append(result)
+                yield json.dumps(result) + "\n"
+
+            failed = sum(1 for result in done if "error" in result)
+            summary = {"done": True, "processed": len(done) - failed, "failed": failed}
+            if request_dir is not None:
+                summary.update(request_id=request_id, pdf_filename=BATCH_REPORT_FILENAME)
+                await run_in_threadpool(_write_batch_report, request_dir, done)
+                artifacts.refresh(request_id)
+            yield json.dumps(summary) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def _write_batch_report(request_dir, results):
+    """Write the detections and combined report of a /process-images/ request"""
+    results = sorted(results, key=lambda result: result["index"])
+    with (request_dir / BATCH_DETECTIONS_FILENAME).open("w") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    items = ({"name": result["filename"], "detections": result["detections"],
+              "image": request_dir / result["annotated_filename"]}
+             for result in results if "error" not in result)
+    # Write to a temporary name so downloads never see a partial file
+    partial_path = request_dir / f".{BATCH_REPORT_FILENAME}.partial"
+    write_report(partial_path, items, title="Batch Detection Report", dpi=config.REPORT_DPI,
+                 quality=config.REPORT_JPEG_QUALITY)
+    partial_path.replace(request_dir / BATCH_REPORT_FILENAME)
+
 @app.get("/download/{request_id}/{filename}")
-async def download_file(request_id: str, filename: str):
-    file_path = TEMP_DIR / request_id / filename
-    if not file_path.exists():
+async def download_file(request: Request, request_id: str, filename: str):
+    """Serve a request's file with ETag, If-None-Match and Range support"""
+    if not artifacts.exists(request_id) or filename.startswith("."):
         return {"error": "File not found"}
-    return FileResponse(file_path)
+    file_path = artifacts.path(request_id) / filename
+    if not file_path.exists():
+        # Reports are built on demand, or awaited if still in progress
+        status = reports.status(request_id)
+        if status.get("pdf_filename") != filename:
+            return {"error": "File not found"}
+        try:
+            file_path = await reports.ensure(request_id)
+        except Exception as e:
+            return {"error": str(e)}
+    artifacts.touch(request_id)
+
+    response = FileResponse(file_path, stat_result=file_path.stat())
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or response.headers["etag"] in tags:
+            return Response(status_code=304, headers={
+                "etag": response.headers["etag"],
+                "last-modified": response.headers["last-modified"],
+            })
+    return response
+
+@app.get("/report-status/{request_id}")
+async def report_status(request_id: str):
+    """State of the PDF report for a processed image"""
+    if not artifacts.exists(request_id):
+        return {"request_id": request_id, "status": "not_found"}
+    return reports.status(request_id)
 
 # Cleanup endpoint (optional)
 @app.delete("/cleanup/{request_id}")
 async def cleanup(request_id: str):
-    request_dir = TEMP_DIR / request_id
-    if request_dir.exists():
-        shutil.rmtree(request_dir)
+    if artifacts.exists(request_id):
+        await run_in_threadpool(artifacts.delete, request_id)
     return {"status": "cleaned"}
 
+@app.post("/reports/")
+async def combined_report(
+    request_ids: list[str] = Body(..., embed=True),
+    title: str = Body("Detection Report", embed=True),
+):
+    """Stream one PDF report covering many processed images
+
+    Pages are sent as they are produced: one per image, downscaled to the
+    page resolution, followed by detection summaries per class and per
+    image.
+    """
+    if not request_ids or len(request_ids) > config.REPORT_MAX_IMAGES:
+        return {"error": f"Between 1 and {config.REPORT_MAX_IMAGES} request ids are required"}
+    unknown = [request_id for request_id in request_ids if not artifacts.exists(request_id)]
+    if unknown:
+        return {"error": f"Unknown request ids: {', '.join(unknown)}"}
+
+    chunks = iter_report(reports.iter_items(request_ids), title=title, dpi=config.REPORT_DPI,
+                         quality=config.REPORT_JPEG_QUALITY)
+    return StreamingResponse(chunks, media_type="application/pdf", headers={
+        "Content-Disposition": 'attachment; filename="detection_report.pdf"'})
+
+@app.post("/process-video/", openapi_extra={"requestBody": {"content": {"multipart/form-data": {
+    "schema": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}},
+               "required": ["file"]}}}, "required": True}})
+async def process_video(
+    request: Request,
+    model: str = config.FRAME_MODEL,
+    input_size: int = Query(config.FRAME_INPUT_SIZE, ge=32, le=1920),
+    conf_threshold: float = Query(0.5, ge=0, le=1),
+    nms_threshold: float = Query(0.4, ge=0, le=1),
+    per_class_nms: bool = False,
+    stride: int = Query(1, ge=1, le=300),
+):
+    """Detect objects in an uploaded video in the background
+
+    Every stride-th frame is detected. The annotated video and the per-frame
+    detections (JSONL) can be downloaded once /video-status/{request_id}
+    reports done. The "file" form field is written to disk as it arrives.
+    """
+    request_id = None
+    try:
+        model, input_size = model_registry.resolve(model, input_size)
+
+        request_id, request_dir = artifacts.create()
+        with metrics.stage("upload"):
+            filename, _ = await stream_upload(request, request_dir)
+        artifacts.refresh(request_id)
+
+        videos.submit(request_id, filename, model, input_size, stride,
+                      conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                      per_class_nms=per_class_nms)
+        video_filename, detections_filename = output_names(filename)
+        return {
+            "request_id": request_id,
+            "filename": filename,
+            "video_filename": video_filename,
+            "detections_filename": detections_filename,
+        }
+    except Exception as e:
+        logger.error(f"Error processing video: {e}")
+        ERRORS.inc(endpoint="process-video")
+        if request_id is not None:
+            await run_in_threadpool(artifacts.delete, request_id)
+        return {"error": str(e)}
+
+@app.get("/video-status/{request_id}")
+async def video_status(request_id: str):
+    """Progress of a video job"""
+    if not artifacts.exists(request_id):
+        return {"request_id": request_id, "status": "not_found"}
+    return videos.status(request_id)
+
+FRAME_MEDIA_TYPES = {"image": "image/jpeg", "overlay": "image/png", "boxes": "application/json"}
+
 @app.post("/process-frame/")
-async def process_frame(file: UploadFile = File(...)):
-    """Process a single frame from video stream"""
+async def process_frame(
+    request: Request,
+    file: UploadFile = File(...),
+    model: str = config.FRAME_MODEL,
+    input_size: int = Query(config.FRAME_INPUT_SIZE, ge=32, le=1920),
+    conf_threshold: float = Query(0.5, ge=0, le=1),
+    nms_threshold: float = Query(0.4, ge=0, le=1),
+    per_class_nms: bool = False,
+    output: str = Query("image", pattern="^(image|overlay|boxes)$"),
+    adaptive: bool = False,
+    track: bool = False,
+    session: str = Query(None, max_length=128),
+):
+    """Process a single frame from video stream
+
+    output=image returns the annotated frame as JPEG. output=overlay returns
+    a transparent PNG with only the boxes and labels, and output=boxes a
+    JSON box list, for clients that composite onto the frame they already
+    have; neither needs the full-size frame decoded.
+
+    With adaptive=true, scale, JPEG quality, input size and frame skipping
+    are tuned per session (the session parameter, or the client address)
+    to stay within YOLO_FRAME_TARGET_MS. Skipped frames are answered with
+    the session's last detections; X-Frame-* headers show the settings used.
+
+    With track=true, full detection only runs every YOLO_TRACK_KEYFRAME_INTERVAL
+    frames or on a scene change; boxes are propagated in between and carry
+    stable track IDs. X-Frame-Keyframe tells whether detection ran.
+    """
+    FRAMES_IN_FLIGHT.inc()
     try:
+        model, input_size = model_registry.resolve(model, input_size)
+        classes = model_registry.get_classes(model)
+
         # Read image data
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
+        with metrics.stage("upload"):
+            contents = await file.read()
+
+        started = time.perf_counter()
+        scale, quality = 0.5, 75
+        media_type = FRAME_MEDIA_TYPES[output]
+        headers = {}
+        frame_session = tracker = track_ids = None
+        if adaptive or track:
+            client = session or (request.client.host if request.client else "unknown")
+            frame_session = frame_sessions.get(client, model, input_size)
+        if track:
+            if frame_session.tracker is None:
+                frame_session.tracker = Tracker(
+                    keyframe_interval=config.TRACK_KEYFRAME_INTERVAL,
+                    scene_threshold=config.TRACK_SCENE_THRESHOLD,
+                )
+            tracker = frame_session.tracker
+        if adaptive:
+            plan = frame_session.plan(inference_pool.queue_depth, inference_pool.max_queue)
+            scale, quality, input_size = plan.scale, plan.quality, plan.input_size
+            headers = plan.headers()
+            if plan.skip:
+                FRAMES_SKIPPED.inc()
+                last = frame_session.last
+                if tracker is not None:
+                    detections, track_ids = tracker.predict()
+                    last = (detections, 1.0)
+                content = await run_in_threadpool(
+                    _reuse_detections, contents, output, classes, last, quality, track_ids)
+                if content is None:
+                    return {"error": "Invalid image data"}
+                return Response(content=content, media_type=media_type, headers=headers)
+
+        # Tracked output depends on earlier frames, so it is never cached
+        cache_key = cached = None
+        if tracker is None:
+            cache_key, cached = await _cache_lookup(
+                contents, endpoint="frame", model=model, input_size=input_size, scale=scale,
+                quality=quality, conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                per_class_nms=per_class_nms, output=output)
+        if cached is not None:
+            return Response(content=cached["annotated"], media_type=media_type, headers=headers)
+
+        image = size = None
+        if output == "image":
+            image, small_image = await run_in_threadpool(pipeline.prepare_frame, contents, scale)
+        else:
+            small_image, size = await run_in_threadpool(pipeline.prepare_frame_small, contents, scale)
+        if small_image is None:
             return {"error": "Invalid image data"}
 
-        # Resize image for faster processing
-        scale = 0.5
-        small_image = cv2.resize(image, None, fx=scale, fy=scale)
-
-        # Detect objects
-        boxes, class_ids, confidences = detector.detect_objects(small_image)
-        
-        # Only draw annotations if objects were detected
-        if len(boxes) > 0:
-            # Scale boxes back to original size
-            boxes = [box / scale for box in boxes]  # boxes are already numpy arrays
-            annotated_image = detector.draw_annotations(image, boxes, class_ids, confidences)
+        # Detect objects, or propagate tracks between keyframes
+        if tracker is None or tracker.needs_detection(small_image):
+            detections = await batcher.detect(
+                small_image, model, input_size, conf_threshold=conf_threshold,
+                nms_threshold=nms_threshold, per_class_nms=per_class_nms)
+            if tracker is not None:
+                detections, track_ids = tracker.update(detections, scale, small_image)
+                scale = 1.0  # tracks are kept in frame coordinates
+                headers["X-Frame-Keyframe"] = "1"
         else:
-            annotated_image = image
-        
-        # Convert back to bytes with reduced quality
-        _, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, 75])
-        image_bytes = buffer.tobytes()
-        
-        return Response(content=image_bytes, media_type="image/jpeg")
+            FRAMES_TRACKED.inc()
+            detections, track_ids = tracker.predict()
+            scale = 1.0
+            headers["X-Frame-Keyframe"] = "0"
 
+        # Annotate and encode with reduced quality
+        content = await run_in_threadpool(
+            pipeline.encode_frame_output, output, image, size, detections, classes, scale,
+            quality, track_ids)
+        if adaptive:
+            frame_session.record(time.perf_counter() - started, detections, scale)
+        if cache_key:
+            await run_in_threadpool(result_cache.put, cache_key, {"annotated": content})
+
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    except PoolFullError as e:
+        return _busy_response(e)
     except Exception as e:
-        print(f"Error processing frame: {str(e)}")  # Add logging
-        return {"error": str(e)} 
\ No newline at end of file
+        logger.error(f"Error processing frame: {e}")
+        ERRORS.inc(endpoint="process-frame")
+        return {"error": str(e)}
+    finally:
+        FRAMES_IN_FLIGHT.dec()
+
+def _reuse_detections(contents, output, classes, last, quality, track_ids=None):
+    """Encode a skipped frame with the detections of the last processed one"""
+    detections, scale = last
+    if output == "image":
+        image = pipeline.decode_image(contents)
+        if image is None:
+            return None
+        return pipeline.encode_frame_output(output, image, None, detections, classes, scale,
+                                            quality, track_ids)
+    size = pipeline.frame_size(contents)
+    if size is None:
+        return None
+    return pipeline.encode_frame_output(output, None, size, detections, classes, scale,
+                                        quality, track_ids)
+
+@app.websocket("/ws/frames")
+async def stream_frames(
+    websocket: WebSocket,
+    model: str = config.FRAME_MODEL,
+    input_size: int = Query(config.FRAME_INPUT_SIZE, ge=32, le=1920),
+    conf_threshold: float = Query(0.5, ge=0, le=1),
+    nms_threshold: float = Query(0.4, ge=0, le=1),
+    per_class_nms: bool = False,
+):
+    """Stream encoded frames in, JSON detections out
+
+    Only the newest frame is processed; frames that arrive while inference
+    is busy replace the waiting one and are counted as dropped. The client
+    draws the returned boxes itself, so no image is sent back.
+    """
+    try:
+        model, input_size = model_registry.resolve(model, input_size)
+        classes = model_registry.get_classes(model)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    await websocket.accept()
+    await websocket.send_json({"type": "classes", "model": model, "classes": classes})
+
+    latest = {"frame": None, "seq": 0, "dropped": 0, "closed": False}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                contents = message.get("bytes")
+                if not contents:
+                    continue  # only binary frames are processed
+                if latest["frame"] is not None:
+                    latest["dropped"] += 1
+                    FRAMES_DROPPED.inc()
+                latest["frame"] = contents
+                latest["seq"] += 1
+                frame_ready.set()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            latest["closed"] = True
+            frame_ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if latest["closed"]:
+                break
+            contents, latest["frame"] = latest["frame"], None
+            if contents is None:
+                continue
+            seq = latest["seq"]
+
+            FRAMES_IN_FLIGHT.inc()
+            try:
+                image = await run_in_threadpool(pipeline.decode_image, contents)
+                if image is None:
+                    await websocket.send_json({"type": "error", "frame": seq,
+                                               "error": "Invalid image data"})
+                    continue
+
+                boxes, class_ids, confidences = await batcher.detect(
+                    image, model, input_size, conf_threshold=conf_threshold,
+                    nms_threshold=nms_threshold, per_class_nms=per_class_nms)
+            except PoolFullError as e:
+                await websocket.send_json({"type": "error", "frame": seq, "error": str(e)})
+                continue
+            finally:
+                FRAMES_IN_FLIGHT.dec()
+
+            height, width = image.shape[:2]
+            await websocket.send_json({
+                "type": "detections",
+                "frame": seq,
+                "width": width,
+                "height": height,
+                "boxes": [[int(v) for v in box] for box in boxes],
+                "class_ids": [int(c) for c in class_ids],
+                "scores": [round(float(c), 3) for c in confidences],
+                "dropped": latest["dropped"],
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    except Exception as e:
+        logger.error(f"Error streaming frames: {e}")
+        ERRORS.inc(endpoint="ws-frames")
+    finally:
+        receiver.cancel()
+
+@app.get("/health/live")
+async def liveness():
+    """The server process is up and handling requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready once every inference worker has loaded and warmed up its models"""
+    status = model_manager.status()
+    return JSONResponse(status_code=200 if model_manager.ready else 503, content=status)
+
+@app.get("/models")
+async def list_models():
+    """Models available on this server, the inference backend and the default per endpoint"""
+    return {
+        "available": model_registry.available_models(),
+        "backend": config.INFERENCE_BACKEND,
+        "defaults": {
+            "process-image": {"model": config.IMAGE_MODEL, "input_size": config.IMAGE_INPUT_SIZE},
+            "process-frame": {"model": config.FRAME_MODEL, "input_size": config.FRAME_INPUT_SIZE},
+        },
+    }
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Result cache hit/miss counters and size"""
+    return result_cache.stats()
+
+@app.get("/stats/artifacts")
+async def artifact_stats():
+    """Size and expiry statistics of stored request files"""
+    return artifacts.stats()
+
+@app.get("/stats/batching")
+async def batching_stats():
+    """Micro-batching statistics for tuning batch size and wait time"""
+    return batcher.stats()
+
+@app.get("/stats/frame-sessions")
+async def frame_session_stats():
+    """Current settings and smoothed latency of adaptive frame sessions"""
+    return frame_sessions.stats()
+
+def _busy_response(error):
+    """503 response returned when the inference queue is full"""
+    return JSONResponse(status_code=503, content={"error": str(error)},
+                        headers={"Retry-After": "1"})
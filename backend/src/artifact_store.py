@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def _dir_size(path):
+    """Total size of the files directly inside a directory"""
+    size = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+class ArtifactStore:
+    """Per-request artifact directories with expiry and a total size cap
+
+    Directories live at root/<first two characters of the id>/<id>, so no
+    single directory grows with the number of requests. A directory expires
+    ttl seconds after it was last written or downloaded; when the total
+    size exceeds max_bytes the least recently used ones are evicted first.
+    Functions in busy_checks can keep a directory from being swept while a
+    job is using it, and delete_hooks are told about every removed request.
+    """
+
+    def __init__(self, root, ttl=3600, max_bytes=2 * 1024 * 1024 * 1024):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.busy_checks = []
+        self.delete_hooks = []
+        self._entries = OrderedDict()  # request_id -> [size, last access], least recent first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            if REQUEST_ID_PATTERN.match(shard.name):
+                # Directory from before sharding: move it into its shard
+                target = self.path(shard.name)
+                target.parent.mkdir(exist_ok=True)
+                shard.rename(target)
+                entries.append((target.stat().st_mtime, shard.name, _dir_size(target)))
+            elif len(shard.name) == 2:
+                for request_dir in shard.iterdir():
+                    if REQUEST_ID_PATTERN.match(request_dir.name) and request_dir.is_dir():
+                        entries.append((request_dir.stat().st_mtime, request_dir.name,
+                                        _dir_size(request_dir)))
+        # Wall-clock mtimes are converted to the monotonic clock used for access times
+        offset = time.monotonic() - time.time()
+        for mtime, request_id, size in sorted(entries):
+            self._entries[request_id] = [size, mtime + offset]
+            self._total_bytes += size
+        logger.info(f"Artifact store: {len(self._entries)} requests, "
+                    f"{self._total_bytes / 1024 / 1024:.1f} MB in {self.root}")
+
+    def path(self, request_id):
+        """Directory of a request; raises ValueError for malformed ids"""
+        if not REQUEST_ID_PATTERN.match(request_id):
+            raise ValueError(f"Invalid request id: {request_id}")
+        return self.root / request_id[:2] / request_id
+
+    def create(self):
+        """Create the directory of a new request and return (request_id, path)"""
+        request_id = str(uuid.uuid4())
+        request_dir = self.path(request_id)
+        request_dir.mkdir(parents=True)
+        with self._lock:
+            self._entries[request_id] = [0, time.monotonic()]
+        return request_id, request_dir
+
+    def exists(self, request_id):
+        try:
+            return self.path(request_id).is_dir()
+        except ValueError:
+            return False
+
+    def touch(self, request_id):
+        """Mark a request as used, postponing its expiry"""
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                self._entries.move_to_end(request_id)
+
+    def refresh(self, request_id):
+        """Account for files written to a request directory"""
+        try:
+            size = _dir_size(self.path(request_id))
+        except (FileNotFoundError, ValueError):
+            return
+        with self._lock:
+            entry = self._entries.setdefault(request_id, [0, time.monotonic()])
+            self._total_bytes += size - entry[0]
+            entry[0] = size
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(request_id)
+
+    def delete(self, request_id):
+        """Remove a request's files and tell the delete hooks"""
+        request_dir = self.path(request_id)
+        with self._lock:
+            entry = self._entries.pop(request_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[0]
+        for hook in self.delete_hooks:
+            hook(request_id)
+        shutil.rmtree(request_dir, ignore_errors=True)
+        try:
+            request_dir.parent.rmdir()  # only succeeds once the shard is empty
+        except OSError:
+            pass
+
+    def _busy(self, request_id):
+        return any(check(request_id) for check in self.busy_checks)
+
+    def sweep(self):
+        """Delete expired requests, then evict the least recently used over the size cap"""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            entries = list(self._entries.items())
+            total = self._total_bytes
+
+        expired, evicted = [], []
+        for request_id, (size, last_access) in entries:
+            if self._busy(request_id):
+                continue
+            if last_access < cutoff:
+                expired.append(request_id)
+                total -= size
+        for request_id, (size, _) in entries:
+            if total <= self.max_bytes:
+                break
+            if request_id in expired or self._busy(request_id):
+                continue
+            evicted.append(request_id)
+            total -= size
+
+        for request_id in expired + evicted:
+            self.delete(request_id)
+        self.expired += len(expired)
+        self.evicted += len(evicted)
+        if expired or evicted:
+            logger.info(f"Artifact store: {len(expired)} expired, {len(evicted)} evicted")
+        return len(expired) + len(evicted)
+
+    async def run_sweeper(self, interval=60):
+        """Sweep every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.sweep)
+            except Exception as e:
+                logger.error(f"Artifact sweep failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+import cv2
+
+import pipeline
+from inference_pool import InferencePool
+from model_registry import resolve
+from report_builder import write_report
+from utils import iter_image_files, create_output_directory
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ["file", "class_id", "label", "confidence", "x1", "y1", "x2", "y2", "error"]
+
+
+def load_done(records_path, fmt, retry_failed=False):
+    """Names of images already recorded in an existing detections file
+
+    Images recorded as failed count as done unless retry_failed is set.
+    """
+    if not records_path.exists():
+        return set()
+    done = set()
+    with records_path.open(newline="") as f:
+        if fmt == "csv":
+            done.update(row["file"] for row in csv.DictReader(f)
+                        if not (retry_failed and row.get("error")))
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partial line from an interrupted run
+                if "file" in record and not (retry_failed and "error" in record):
+                    done.add(record["file"])
+    return done
+
+
+class RecordWriter:
+    """Append per-image detections as JSONL (one line per image) or CSV (one row per box)"""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new_file = not path.exists() or path.stat().st_size == 0
+        self._file = path.open("a", newline="")
+        if fmt == "csv":
+            fields = CSV_FIELDS
+            if not new_file:
+                # Keep the columns of an existing file (older files have no error column)
+                with path.open(newline="") as existing:
+                    fields = next(csv.reader(existing), CSV_FIELDS)
+            self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction="ignore")
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, name, width, height, detections):
+        if self.fmt == "csv":
+            # Images without detections get one empty row so resuming skips them
+            rows = [{"file": name, "class_id": d["class_id"], "label": d["label"],
+                     "confidence": d["confidence"],
+                     **dict(zip(["x1", "y1", "x2", "y2"], d["box"]))}
+                    for d in detections] or [{"file": name}]
+            self._writer.writerows(rows)
+        else:
+            self._file.write(json.dumps({"file": name, "width": width, "height": height,
+                                         "detections": detections}) + "\n")
+        self._file.flush()
+
+    def write_error(self, name, error):
+        """Record an image that could not be processed, so resuming skips it"""
+        if self.fmt == "csv":
+            self._writer.writerow({"file": name, "error": error})
+        else:
+            self._file.write(json.dumps({"file": name, "error": error}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def iter_records(records_path, fmt):
+    """(relative path, detections) for each processed image in a detections file
+
+    Images recorded as failed are left out.
+    """
+    with records_path.open(newline="") as f:
+        if fmt == "csv":
+            # The rows of one image are written together
+            for name, rows in itertools.groupby(csv.DictReader(f), key=lambda row: row["file"]):
+                rows = list(rows)
+                if any(row.get("error") for row in rows):
+                    continue
+                yield name, [{"label": row["label"], "confidence": float(row["confidence"])}
+                             for row in rows if row["label"]]
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partial line from an interrupted run
+                if "detections" in record:
+                    yield record["file"], record["detections"]
+
+
+def build_report(output_dir, report_path, fmt="jsonl", **options):
+    """Write one PDF report over the annotated images of a processed directory"""
+    output_dir = Path(output_dir)
+    items = ({"name": name, "detections": detections,
+              "image": output_dir / "annotated" / Path(name).parent / f"annotated_{Path(name).name}"}
+             for name, detections in iter_records(output_dir / f"detections.{fmt}", fmt))
+    write_report(report_path, items, **options)
+    logger.info(f"Report written to {report_path}")
+
+
+def process_directory(input_dir, output_dir, model="yolov3", input_size=None, workers=None,
+                      decode_threads=4, fmt="jsonl", max_in_flight=None, recursive=False,
+                      retry_failed=False, **options):
+    """Detect objects in every image of input_dir, skipping images already done
+
+    Files are streamed from the directory, decoded in a thread pool and
+    detected in a pool of worker processes that each hold their own
+    detector. Annotated images go to output_dir/annotated (mirroring
+    subdirectories) and detections to output_dir/detections.<fmt>, keyed by
+    the path relative to input_dir. Images that fail are recorded with
+    their error and skipped by later runs unless retry_failed is set.
+    Returns (processed, failed, skipped).
+    """
+    model, input_size = resolve(model, input_size)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    annotated_dir = create_output_directory(output_dir, "annotated")
+    records_path = Path(output_dir) / f"detections.{fmt}"
+    done = load_done(records_path, fmt, retry_failed)
+
+    pool = InferencePool(workers=workers, max_queue=max_in_flight, mode="process")
+    decode_pool = ThreadPoolExecutor(max_workers=decode_threads, thread_name_prefix="decode")
+    writer = RecordWriter(records_path, fmt)
+
+    input_dir = Path(input_dir)
+    in_flight = {}  # future -> (stage, relative path, image shape)
+    processed = failed = skipped = 0
+    started = time.perf_counter()
+
+    def handle(future):
+        nonlocal processed, failed
+        stage, path, shape = in_flight.pop(future)
+        try:
+            if stage == "decode":
+                image = future.result()
+                if image is None:
+                    raise ValueError("could not decode image")
+                output_path = annotated_dir / path.parent / f"annotated_{path.name}"
+                detect = pool.submit(pipeline.detect_and_save, image, output_path, input_size,
+                                     options, model=model)
+                in_flight[detect] = ("detect", path, image.shape)
+                return
+            writer.write(path.as_posix(), shape[1], shape[0], future.result())
+            processed += 1
+            if processed % 100 == 0:
+                rate = processed / (time.perf_counter() - started)
+                logger.info(f"Processed {processed} images ({rate:.1f} images/sec)")
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to process {path}: {e}")
+            writer.write_error(path.as_posix(), str(e))
+
+    try:
+        for full_path in iter_image_files(input_dir, recursive):
+            path = full_path.relative_to(input_dir)
+            if path.as_posix() in done:
+                skipped += 1
+                continue
+            while len(in_flight) >= max_in_flight:
+                completed, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in completed:
+                    handle(future)
+            in_flight[decode_pool.submit(cv2.imread, str(full_path))] = ("decode", path, None)
+
+        while in_flight:
+            completed, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in completed:
+                handle(future)
+    finally:
+        writer.close()
+        decode_pool.shutdown()
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0
+    logger.info(f"Done: {processed} processed, {failed} failed, {skipped} already done "
+                f"in {elapsed:.1f}s ({rate:.1f} images/sec)")
+    return processed, failed, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run object detection over a directory of images")
+    parser.add_argument("input_dir", help="Directory containing images")
+    parser.add_argument("output_dir", help="Directory for annotated images and detections")
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    parser.add_argument("--model", default="yolov3", help="Model name from the registry")
+    parser.add_argument("--input-size", type=int, default=None, help="Network input size")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Detection processes (default: number of CPUs)")
+    parser.add_argument("--decode-threads", type=int, default=4, help="Image decoding threads")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl",
+                        help="Format of the detections file")
+    parser.add_argument("--conf-threshold", type=float, default=0.5)
+    parser.add_argument("--nms-threshold", type=float, default=0.4)
+    parser.add_argument("--per-class-nms", action="store_true")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Process images recorded as failed by an earlier run again")
+    parser.add_argument("--report", default=None,
+                        help="Also write a PDF report over all processed images to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("utils").setLevel(logging.WARNING)  # one line per saved image is too much
+    _, failed, _ = process_directory(
+        args.input_dir, args.output_dir, model=args.model, input_size=args.input_size,
+        workers=args.workers, decode_threads=args.decode_threads, fmt=args.format,
+        recursive=args.recursive, retry_failed=args.retry_failed,
+        conf_threshold=args.conf_threshold, nms_threshold=args.nms_threshold,
+        per_class_nms=args.per_class_nms)
+    if args.report:
+        build_report(args.output_dir, args.report, fmt=args.format)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+
+import metrics
+import pipeline
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = metrics.Histogram("yolo_inference_batch_size", "Images per forward pass",
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+class MicroBatcher:
+    """Group detection requests that arrive close together into one forward pass
+
+    Images submitted within max_wait_ms of the first pending image (or until
+    max_batch images are pending) are sent to the inference pool as a single
+    batch. Only requests for the same model and input size share a batch.
+    Each caller receives only the detections for its own image.
+    """
+
+    def __init__(self, pool, max_batch=8, max_wait_ms=10, history=1000):
+        self.pool = pool
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._pending = {}  # (model, input_size) -> [(image, options, future, queued)]
+        self._timers = {}
+        self._tasks = set()
+
+        # Tuning statistics
+        self._batch_sizes = Counter()
+        self._recent = deque(maxlen=history)  # (batch size, wait ms, inference ms)
+
+    async def detect(self, image, model="yolov3", input_size=None, **options):
+        """Queue an image for the next batch and await its detections
+
+        options are passed to the detector's post-processing for this image
+        only (conf_threshold, nms_threshold, per_class_nms).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (model, input_size)
+        pending = self._pending.setdefault(key, [])
+        pending.append((image, options, future, time.perf_counter()))
+
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        detections, wait_seconds, timings = await future
+        metrics.record_stage("batch_wait", wait_seconds)
+        metrics.add_timings(timings)
+        return detections
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(key, [])
+        batch, rest = pending[:self.max_batch], pending[self.max_batch:]
+        if rest:
+            self._pending[key] = rest
+            self._timers[key] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, key)
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key, batch):
+        model, input_size = key
+        images = [image for image, _, _, _ in batch]
+        options = [opts for _, opts, _, _ in batch]
+        started = time.perf_counter()
+        wait_ms = max((started - queued) * 1000 for _, _, _, queued in batch)
+        try:
+            job = self.pool.submit(pipeline.detect_batch, images, options, input_size, model=model)
+            results = await asyncio.wrap_future(job)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        inference_ms = (time.perf_counter() - started) * 1000
+        self._batch_sizes[len(batch)] += 1
+        self._recent.append((len(batch), wait_ms, inference_ms))
+        BATCH_SIZE.observe(len(batch))
+
+        for (_, _, future, queued), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, started - queued, job.stage_timings))
+
+    def stats(self):
+        """Batch size and latency figures for tuning max_batch and max_wait_ms"""
+        recent = list(self._recent)
+        count = len(recent)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": sum(len(p) for p in self._pending.values()),
+            "batches": sum(self._batch_sizes.values()),
+            "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            "recent_avg_batch_size": sum(r[0] for r in recent) / count if count else 0,
+            "recent_avg_wait_ms": sum(r[1] for r in recent) / count if count else 0,
+            "recent_avg_inference_ms": sum(r[2] for r in recent) / count if count else 0,
+        }
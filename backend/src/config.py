@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+# Paths default to the backend directory, wherever the server is started from
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEMP_DIR = os.environ.get("YOLO_TEMP_DIR", str(BACKEND_DIR / "temp"))
+
+# Model files and per-endpoint model selection
+MODELS_DIR = os.environ.get("YOLO_MODELS_DIR", str(BACKEND_DIR / "models"))
+IMAGE_MODEL = os.environ.get("YOLO_IMAGE_MODEL", "yolov3")
+IMAGE_INPUT_SIZE = _env_int("YOLO_IMAGE_INPUT_SIZE", 608)
+FRAME_MODEL = os.environ.get("YOLO_FRAME_MODEL", "yolov3-tiny")
+FRAME_INPUT_SIZE = _env_int("YOLO_FRAME_INPUT_SIZE", 320)
+# Models every inference worker loads and warms up at startup (comma separated)
+PRELOAD_MODELS = [name.strip() for name in os.environ.get(
+    "YOLO_PRELOAD_MODELS", f"{IMAGE_MODEL},{FRAME_MODEL}").split(",") if name.strip()]
+
+# Inference backend: "opencv", "onnxruntime" or "onnxruntime-int8" (ONNX models only)
+INFERENCE_BACKEND = os.environ.get("YOLO_INFERENCE_BACKEND", "opencv")
+INFERENCE_THREADS = _env_int("YOLO_INFERENCE_THREADS", 0)  # threads per forward pass, 0: one per core
+OPENCV_BACKEND = os.environ.get("YOLO_OPENCV_BACKEND", "default")  # default, opencv, openvino, cuda
+OPENCV_TARGET = os.environ.get("YOLO_OPENCV_TARGET", "cpu")  # cpu, opencl, opencl_fp16, cuda, cuda_fp16
+
+# Inference worker pool
+INFERENCE_MODE = os.environ.get("YOLO_INFERENCE_MODE", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = _env_int("YOLO_INFERENCE_WORKERS", 2)
+INFERENCE_QUEUE_SIZE = _env_int("YOLO_INFERENCE_QUEUE_SIZE", 8)
+
+# Micro-batching of forward passes
+MAX_BATCH_SIZE = _env_int("YOLO_MAX_BATCH_SIZE", 8)
+MAX_BATCH_WAIT_MS = _env_int("YOLO_MAX_BATCH_WAIT_MS", 10)
+BATCH_BUSY_TIMEOUT = _env_float("YOLO_BATCH_BUSY_TIMEOUT", 30)  # seconds a /process-images/ image waits for room
+
+# Result cache for repeated images
+CACHE_MAX_MB = _env_int("YOLO_CACHE_MAX_MB", 256)  # 0 disables the in-memory tier
+CACHE_DIR = os.environ.get("YOLO_CACHE_DIR", "")  # empty disables the disk tier
+CACHE_DISK_MAX_MB = _env_int("YOLO_CACHE_DISK_MAX_MB", 1024)
+
+# Adaptive /process-frame/ sessions (adaptive=true)
+FRAME_TARGET_MS = _env_int("YOLO_FRAME_TARGET_MS", 100)  # per-frame latency budget
+FRAME_SESSION_TTL = _env_int("YOLO_FRAME_SESSION_TTL", 300)  # seconds idle before state is dropped
+
+# Tracking between keyframes on /process-frame/ (track=true)
+TRACK_KEYFRAME_INTERVAL = _env_int("YOLO_TRACK_KEYFRAME_INTERVAL", 5)  # frames per full detection
+TRACK_SCENE_THRESHOLD = _env_int("YOLO_TRACK_SCENE_THRESHOLD", 20)  # mean thumbnail difference, 0-255
+
+# Background video jobs (/process-video/)
+VIDEO_WORKERS = _env_int("YOLO_VIDEO_WORKERS", 1)  # videos processed at the same time
+VIDEO_BATCH_SIZE = _env_int("YOLO_VIDEO_BATCH_SIZE", 4)  # frames per forward pass
+
+# Tiled detection of large images (/process-image/?tiled=true)
+TILE_SIZE = _env_int("YOLO_TILE_SIZE", 0)  # 0 uses the network input size
+TILE_OVERLAP = _env_float("YOLO_TILE_OVERLAP", 0.2)  # fraction of a tile shared with its neighbour
+TILE_BATCH_SIZE = _env_int("YOLO_TILE_BATCH_SIZE", 8)  # tiles per forward pass
+TILE_MAX_TILES = _env_int("YOLO_TILE_MAX_TILES", 64)  # larger tile grids are refused
+
+# Stored request files (uploads, annotated images, reports, videos)
+ARTIFACT_TTL = _env_int("YOLO_ARTIFACT_TTL", 3600)  # seconds since last write or download
+ARTIFACT_MAX_MB = _env_int("YOLO_ARTIFACT_MAX_MB", 2048)  # least recently used evicted beyond this
+ARTIFACT_SWEEP_INTERVAL = _env_int("YOLO_ARTIFACT_SWEEP_INTERVAL", 60)  # seconds between sweeps
+
+# Multi-image PDF reports (/reports/)
+REPORT_DPI = _env_int("YOLO_REPORT_DPI", 150)  # resolution images are downscaled to on the page
+REPORT_JPEG_QUALITY = _env_int("YOLO_REPORT_JPEG_QUALITY", 80)  # for images that are re-encoded
+REPORT_MAX_IMAGES = _env_int("YOLO_REPORT_MAX_IMAGES", 1000)
@@ -1,22 +1,27 @@
+import sys
 import urllib.request
 from pathlib import Path
 
+import config
+from model_registry import MODELS, NAMES_URLS
+
 def download_file(url, filename):
     print(f"Downloading {filename}...")
     urllib.request.urlretrieve(url, filename)
     print(f"Downloaded {filename}")
 
-def download_yolo_files():
+def download_yolo_files(models=None):
     # Create models directory if it doesn't exist
-    models_dir = Path("models")
+    models_dir = Path(config.MODELS_DIR)
     models_dir.mkdir(exist_ok=True)
 
-    # URLs for YOLOv3 files
-    files = {
-        "yolov3.weights": "https://pjreddie.com/media/files/yolov3.weights",
-        "yolov3.cfg": "https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3.cfg",
-        "coco.names": "https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names"
-    }
+    # URLs for the requested model variants (all registered ones by default)
+    files = dict(NAMES_URLS)
+    for name in models or MODELS:
+        if name not in MODELS:
+            print(f"Unknown model: {name}")
+            return False
+        files.update(MODELS[name]["urls"])
 
     # Download each file
     for filename, url in files.items():
@@ -31,7 +36,7 @@ def download_yolo_files():
     return True
 
 if __name__ == "__main__":
-    if download_yolo_files():
+    if download_yolo_files(sys.argv[1:]):
         print("All model files downloaded successfully!")
     else:
-        print("Error downloading model files!") 
\ No newline at end of file
+        print("Error downloading model files!")
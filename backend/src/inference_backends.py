@@ -0,0 +1,141 @@
+import logging
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OPENCV_BACKENDS = {
+    "default": cv2.dnn.DNN_BACKEND_DEFAULT,
+    "opencv": cv2.dnn.DNN_BACKEND_OPENCV,
+    "openvino": cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+    "cuda": cv2.dnn.DNN_BACKEND_CUDA,
+}
+OPENCV_TARGETS = {
+    "cpu": cv2.dnn.DNN_TARGET_CPU,
+    "opencl": cv2.dnn.DNN_TARGET_OPENCL,
+    "opencl_fp16": cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    "cuda": cv2.dnn.DNN_TARGET_CUDA,
+    "cuda_fp16": cv2.dnn.DNN_TARGET_CUDA_FP16,
+}
+QUANTIZED_SUFFIX = ".int8.onnx"
+
+# ONNX Runtime sessions can run from several threads at once, so the inference
+# workers of a process share one session (and one copy of its weights) per
+# model file and thread count. OpenCV nets cannot be shared that way.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def read_net(models_dir, spec):
+    """Load a network from its weights (and Darknet config) file"""
+    if spec["config"]:
+        return cv2.dnn.readNet(str(models_dir / spec["weights"]), str(models_dir / spec["config"]))
+    return cv2.dnn.readNetFromONNX(str(models_dir / spec["weights"]))
+
+
+def quantized_path(weights_path):
+    """Where the INT8 version of an ONNX model is stored"""
+    weights_path = Path(weights_path)
+    return weights_path.with_name(weights_path.stem + QUANTIZED_SUFFIX)
+
+
+class OpenCVBackend:
+    """cv2.dnn network with a chosen computation backend and target
+
+    threads sets the size of OpenCV's thread pool, which is shared by the
+    whole process (0 keeps OpenCV's default of one thread per core).
+    """
+
+    def __init__(self, models_dir, spec, threads=0, backend="default", target="cpu"):
+        if backend not in OPENCV_BACKENDS:
+            raise ValueError(f"Unknown OpenCV backend: {backend}")
+        if target not in OPENCV_TARGETS:
+            raise ValueError(f"Unknown OpenCV target: {target}")
+        self.net = read_net(models_dir, spec)
+        self.net.setPreferableBackend(OPENCV_BACKENDS[backend])
+        self.net.setPreferableTarget(OPENCV_TARGETS[target])
+        if threads:
+            cv2.setNumThreads(threads)
+        layer_names = self.net.getLayerNames()
+        self.output_layers = [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
+
+    def forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward(self.output_layers)
+
+
+def _shared_session(model_path, threads):
+    """The process's ONNX Runtime session for a model, created on first use"""
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("The onnxruntime backends need the onnxruntime package")
+
+    key = (str(model_path), threads)
+    with _sessions_lock:
+        if key not in _sessions:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _sessions[key] = onnxruntime.InferenceSession(str(model_path), options,
+                                                          providers=["CPUExecutionProvider"])
+        return _sessions[key]
+
+
+class OnnxRuntimeBackend:
+    """ONNX Runtime session on the CPU, optionally running the INT8 model
+
+    threads is the number of intra-op threads of the session (0 lets ONNX
+    Runtime use one per core); operators run one at a time, since a call
+    only ever runs one batch. Backends of the same model in one process
+    share their session, so thread workers hold the weights only once.
+    Models exported with a fixed batch size of 1 are run image by image.
+    """
+
+    def __init__(self, models_dir, spec, threads=0, quantized=False):
+        if spec["config"]:
+            raise ValueError(f"ONNX Runtime can only run ONNX models, not {spec['weights']}")
+
+        model_path = Path(models_dir) / spec["weights"]
+        if quantized:
+            model_path = quantized_path(model_path)
+            if not model_path.exists():
+                raise ValueError(f"No INT8 model at {model_path}; create it with "
+                                 f"quantize_model.py {Path(spec['weights']).stem}")
+
+        self.session = _shared_session(model_path, threads)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.single_image = model_input.shape[0] == 1
+
+    def forward(self, blob):
+        if self.single_image and len(blob) > 1:
+            outs = [self.session.run(None, {self.input_name: blob[i:i + 1]})
+                    for i in range(len(blob))]
+            return [np.concatenate(parts) for parts in zip(*outs)]
+        return self.session.run(None, {self.input_name: blob})
+
+
+BACKENDS = {
+    "opencv": OpenCVBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+    "onnxruntime-int8": lambda models_dir, spec, threads=0: OnnxRuntimeBackend(
+        models_dir, spec, threads, quantized=True),
+}
+
+
+def create_backend(name, models_dir, spec, threads=0, **options):
+    """Load a model into the named inference backend
+
+    Every backend has forward(blob) returning the network's output arrays,
+    one (images, rows, values) array per output layer. options are passed
+    to the backend (backend and target for opencv).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    return BACKENDS[name](Path(models_dir), spec, threads, **options)
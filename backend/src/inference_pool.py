@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+import metrics
+from object_detection import ObjectDetector
+
+logger = logging.getLogger(__name__)
+
+# Each worker thread (or process) keeps its own detector per model, since a
+# cv2.dnn net must not be used from more than one thread at a time. Loaded
+# detectors stay warm for the lifetime of the worker.
+_worker_state = threading.local()
+
+
+class PoolFullError(Exception):
+    """Raised when the inference queue is at capacity"""
+
+
+def get_worker_detector(model="yolov3"):
+    """Return the current worker's detector for a model, loading it on first use"""
+    detectors = getattr(_worker_state, "detectors", None)
+    if detectors is None:
+        detectors = _worker_state.detectors = {}
+    if model not in detectors:
+        logger.info(f"Loading {model} for worker {os.getpid()}/{threading.current_thread().name}")
+        detectors[model] = ObjectDetector(model)
+    return detectors[model]
+
+
+def _init_worker(preload):
+    """Load and warm up (model, input_size) pairs when a worker starts
+
+    Errors are only logged: a failing initializer would break the whole
+    executor, while a missing model should only fail requests that use it.
+    """
+    for model, input_size in preload:
+        try:
+            get_worker_detector(model).warm_up(input_size)
+        except Exception as e:
+            logger.error(f"Could not preload {model}: {e}")
+
+
+def _run_job(fn, model, args):
+    """Run a job function with the worker's detector as first argument
+
+    Returns the result together with the stage timings recorded by the job.
+    """
+    with metrics.collect_timings() as timings:
+        result = fn(get_worker_detector(model), *args)
+    return result, timings
+
+
+class InferencePool:
+    def __init__(self, workers=2, max_queue=8, mode="thread", preload=()):
+        """preload lists (model, input_size) pairs each worker loads and warms up on start"""
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference mode: {mode}")
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.mode = mode
+        self.preload = list(preload)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        init = dict(initializer=_init_worker, initargs=(self.preload,))
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, **init)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="inference", **init)
+
+    @property
+    def in_flight(self):
+        """Number of jobs currently running or waiting for a worker"""
+        return self._pending
+
+    @property
+    def queue_depth(self):
+        """Number of jobs waiting for a free worker"""
+        return max(0, self._pending - self.workers)
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                raise PoolFullError("Inference queue is full, try again later")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args, model="yolov3"):
+        """Submit fn(detector, *args) to a worker and return a concurrent Future
+
+        detector is the worker's instance of the given model. fn must be a
+        module-level function so it can be sent to worker processes. Raises
+        PoolFullError when the queue is full. The stage timings recorded by
+        the job are available as the future's stage_timings attribute.
+        """
+        self._acquire()
+        try:
+            job = self._executor.submit(_run_job, fn, model, args)
+        except Exception:
+            self._release()
+            raise
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def finish(job):
+            self._release()
+            try:
+                result, timings = job.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            if self.mode == "process":
+                # Stage metrics recorded in a worker process don't reach this one
+                for name, seconds in timings:
+                    metrics.STAGE_SECONDS.observe(seconds, stage=name)
+            future.stage_timings = timings
+            future.set_result(result)
+
+        job.add_done_callback(finish)
+        return future
+
+    async def run(self, fn, *args, model="yolov3"):
+        """Run fn(detector, *args) on a worker and await its result"""
+        future = self.submit(fn, *args, model=model)
+        result = await asyncio.wrap_future(future)
+        metrics.add_timings(future.stage_timings)
+        return result
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,154 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus-style metrics. Stage timings are also collected per
+# request (or per worker job) so they can be returned in a Server-Timing
+# header.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+_current_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self._values = {}
+        self._function = function  # read the value from elsewhere, e.g. a cache's counters
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self._value = 0
+        self._function = function
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def _samples(self):
+        value = self._function() if self._function is not None else self._value
+        return [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+STAGE_SECONDS = Histogram("yolo_stage_duration_seconds",
+                          "Time spent in each stage of the detection and report pipelines")
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stage timings recorded in this context into a list"""
+    timings = []
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def add_timings(timings):
+    """Add (stage, seconds) pairs measured elsewhere to the current collection"""
+    collected = _current_timings.get()
+    if collected is not None:
+        collected.extend(timings)
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    add_timings([(name, seconds)])
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def server_timing_header(timings):
+    """Format collected timings as a Server-Timing header, summing repeated stages"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import time
+
+import pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ModelManager:
+    """Loads and warms up the served models on every inference worker
+
+    Workers load their preload list as soon as they start; start() makes
+    the pool start all of them by sending a warm-up job per worker and model,
+    and records when every model is ready to serve. A model that fails to
+    load marks the manager failed.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.state = "starting"
+        self.error = None
+        self.load_seconds = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    async def start(self):
+        """Warm up all workers; errors are recorded rather than raised"""
+        self.state = "loading"
+        started = time.perf_counter()
+        try:
+            for model, input_size in self.pool.preload:
+                # One job per worker, submitted together so every worker starts
+                await asyncio.gather(*(
+                    self.pool.run(pipeline.warm_up, input_size, model=model)
+                    for _ in range(self.pool.workers)
+                ))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}")
+            self.state, self.error = "failed", str(e)
+            return
+        self.load_seconds = round(time.perf_counter() - started, 2)
+        self.state = "ready"
+        logger.info(f"Models ready in {self.load_seconds}s: "
+                    f"{', '.join(model for model, _ in self.pool.preload) or 'none'}")
+
+    def status(self):
+        status = {
+            "status": self.state,
+            "models": [{"model": model, "input_size": size} for model, size in self.pool.preload],
+            "workers": self.pool.workers,
+            "mode": self.pool.mode,
+        }
+        if self.load_seconds is not None:
+            status["load_seconds"] = self.load_seconds
+        if self.error:
+            status["error"] = self.error
+        return status
@@ -0,0 +1,84 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import config
+from inference_backends import QUANTIZED_SUFFIX
+
+# Known model variants. Darknet models need weights and a cfg; any
+# <name>.onnx file placed in the models directory is picked up as well and
+# must output YOLO-style rows (center_x, center_y, w, h, objectness, scores).
+MODELS = {
+    "yolov3": {
+        "weights": "yolov3.weights",
+        "config": "yolov3.cfg",
+        "names": "coco.names",
+        "input_size": 416,
+        "urls": {
+            "yolov3.weights": "https://pjreddie.com/media/files/yolov3.weights",
+            "yolov3.cfg": "https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3.cfg",
+        },
+    },
+    "yolov3-tiny": {
+        "weights": "yolov3-tiny.weights",
+        "config": "yolov3-tiny.cfg",
+        "names": "coco.names",
+        "input_size": 416,
+        "urls": {
+            "yolov3-tiny.weights": "https://pjreddie.com/media/files/yolov3-tiny.weights",
+            "yolov3-tiny.cfg": "https://raw.githubusercontent.com/pjreddie/darknet/master/cfg/yolov3-tiny.cfg",
+        },
+    },
+}
+
+# Discovered model names map straight to files in the models directory
+MODEL_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
+
+NAMES_URLS = {
+    "coco.names": "https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names",
+}
+
+
+def load_classes(names_path):
+    """Load class names, one per line"""
+    with open(names_path, "r") as f:
+        return [line.strip() for line in f.readlines()]
+
+
+def get_model_spec(name, models_dir=None):
+    """Return the spec of a registered or discovered ONNX model
+
+    Only plain names of files directly inside the models directory are
+    accepted, so a name can never point elsewhere or alias another model.
+    """
+    if name in MODELS:
+        return MODELS[name]
+    models_dir = Path(models_dir or config.MODELS_DIR)
+    if (MODEL_NAME_PATTERN.match(name) and not f"{name}.onnx".endswith(QUANTIZED_SUFFIX)
+            and (models_dir / f"{name}.onnx").is_file()):
+        return {"weights": f"{name}.onnx", "config": None, "names": "coco.names", "input_size": 416}
+    raise ValueError(f"Unknown model: {name}")
+
+
+def available_models(models_dir=None):
+    """Names of all models whose files are present in the models directory"""
+    models_dir = Path(models_dir or config.MODELS_DIR)
+    names = [name for name, spec in MODELS.items() if (models_dir / spec["weights"]).exists()]
+    names += sorted(path.stem for path in models_dir.glob("*.onnx")
+                    if not path.name.endswith(QUANTIZED_SUFFIX))
+    return names
+
+
+def resolve(name, input_size=None):
+    """Validate a model name and input size, filling in the model's default size"""
+    spec = get_model_spec(name)
+    input_size = input_size or spec["input_size"]
+    if input_size % 32 != 0:
+        raise ValueError(f"Input size must be a multiple of 32, got {input_size}")
+    return name, input_size
+
+
+@lru_cache(maxsize=None)
+def get_classes(name):
+    """Class names of a model, loaded once per process"""
+    return load_classes(Path(config.MODELS_DIR) / get_model_spec(name)["names"])
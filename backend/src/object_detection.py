@@ -2,109 +2,177 @@ import cv2
 import numpy as np
 from pathlib import Path
 
+import config
+from inference_backends import create_backend
+from metrics import stage
+from model_registry import get_model_spec, load_classes
+from rendering import draw_detections
+from tiling import merge_detections, tile_grid
+
+
 class ObjectDetector:
-    def __init__(self):
-        # Update paths to look in models directory
-        models_dir = Path("models")
-        
-        # Load YOLO model
-        self.net = cv2.dnn.readNet(
-            str(models_dir / "yolov3.weights"),
-            str(models_dir / "yolov3.cfg")
-        )
-        
+    def __init__(self, model="yolov3", models_dir=None, backend=None, threads=None):
+        """backend and threads default to YOLO_INFERENCE_BACKEND and YOLO_INFERENCE_THREADS"""
+        # Look up model files in the models directory
+        models_dir = Path(models_dir or config.MODELS_DIR)
+        spec = get_model_spec(model, models_dir)
+        self.model = model
+        self.input_size = spec["input_size"]
+
+        # Load YOLO model into the inference backend
+        self.backend_name = backend or config.INFERENCE_BACKEND
+        options = {}
+        if self.backend_name == "opencv":
+            options = {"backend": config.OPENCV_BACKEND, "target": config.OPENCV_TARGET}
+        self.backend = create_backend(self.backend_name, models_dir, spec,
+                                      config.INFERENCE_THREADS if threads is None else threads,
+                                      **options)
+
         # Load COCO names
-        with open(models_dir / "coco.names", "r") as f:
-            self.classes = [line.strip() for line in f.readlines()]
+        self.classes = load_classes(models_dir / spec["names"])
         
-        self.layer_names = self.net.getLayerNames()
-        self.output_layers = [self.layer_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
         self.colors = np.random.uniform(0, 255, size=(len(self.classes), 3))
 
-    def detect_objects(self, image):
-        height, width, _ = image.shape
-        blob = cv2.dnn.blobFromImage(image, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-        
-        self.net.setInput(blob)
-        outs = self.net.forward(self.output_layers)
-
-        # Showing information on the screen
-        class_ids = []
-        confidences = []
-        boxes = []
-
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                if confidence > 0.5:
-                    # Object detected
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-
-                    # Rectangle coordinates
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-
-        # Apply Non-Maximum Suppression
-        if boxes:
-            indices = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-            filtered_boxes = []
-            filtered_class_ids = []
-            filtered_confidences = []
-            for i in indices.flatten():
-                x, y, w, h = boxes[i]
-                filtered_boxes.append(np.array([x, y, x + w, y + h]))
-                filtered_class_ids.append(class_ids[i])
-                filtered_confidences.append(confidences[i])
-            return filtered_boxes, filtered_class_ids, filtered_confidences
-
-        return [], [], []
+    def warm_up(self, input_size=None):
+        """Run one forward pass so the first request does not pay for network setup"""
+        size = input_size or self.input_size
+        self.detect_objects(np.zeros((size, size, 3), dtype=np.uint8), input_size=size)
+
+    def detect_objects(self, image, conf_threshold=0.5, nms_threshold=0.4, per_class_nms=False,
+                       input_size=None):
+        options = dict(conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                       per_class_nms=per_class_nms)
+        return self.detect_objects_batch([image], [options], input_size)[0]
+
+    def detect_objects_batch(self, images, options=None, input_size=None):
+        """Run one forward pass over several images and return detections per image
+
+        options is an optional list with one dict of _postprocess keyword
+        arguments (thresholds, NMS mode) per image. input_size overrides the
+        model's default network resolution.
+        """
+        size = input_size or self.input_size
+        with stage("blob"):
+            blob = cv2.dnn.blobFromImages(images, 0.00392, (size, size), (0, 0, 0), True, crop=False)
+
+        with stage("forward"):
+            outs = self.backend.forward(blob)
+
+        # Output layers drop the batch dimension for a single image
+        outs = [out.reshape(len(images), -1, out.shape[-1]) for out in outs]
+
+        results = []
+        for i, image in enumerate(images):
+            height, width = image.shape[:2]
+            kwargs = options[i] if options else {}
+            results.append(self._postprocess([out[i] for out in outs], width, height, **kwargs))
+        return results
+
+    def detect_objects_tiled(self, image, tile_size=None, overlap=0.2, batch_size=8,
+                             conf_threshold=0.5, nms_threshold=0.4, per_class_nms=False,
+                             input_size=None, max_tiles=None):
+        """Detect objects in overlapping tiles of a large image
+
+        Tiles of tile_size pixels (default: the network input size, so tiles
+        are not downscaled) go through the network batch_size at a time,
+        together with one pass over the whole image for objects larger than
+        a tile. The results are merged by a global NMS in image coordinates.
+        More than max_tiles tiles is refused with a ValueError.
+        """
+        size = input_size or self.input_size
+        tile_size = tile_size or size
+        height, width = image.shape[:2]
+        offsets = tile_grid(height, width, tile_size, overlap)
+        if max_tiles and len(offsets) > max_tiles:
+            raise ValueError(f"{len(offsets)} tiles exceed the limit of {max_tiles}")
+        options = dict(conf_threshold=conf_threshold, nms_threshold=nms_threshold,
+                       per_class_nms=per_class_nms)
+        if len(offsets) == 1:
+            return self.detect_objects(image, input_size=size, **options)
+
+        boxes, class_ids, confidences, regions = [], [], [], []
+        for start in range(0, len(offsets), batch_size):
+            batch = offsets[start:start + batch_size]
+            tiles = [image[y:y + tile_size, x:x + tile_size] for x, y in batch]
+            results = self.detect_objects_batch(tiles, [options] * len(tiles), size)
+            for (x, y), tile, (tile_boxes, tile_class_ids, tile_confidences) \
+                    in zip(batch, tiles, results):
+                boxes.extend(box + (x, y, x, y) for box in tile_boxes)
+                class_ids.extend(tile_class_ids)
+                confidences.extend(tile_confidences)
+                regions.extend([(x, y, x + tile.shape[1], y + tile.shape[0])] * len(tile_boxes))
+
+        full_boxes, full_class_ids, full_confidences = self.detect_objects(
+            image, input_size=size, **options)
+        boxes.extend(full_boxes)
+        class_ids.extend(full_class_ids)
+        confidences.extend(full_confidences)
+        regions.extend([None] * len(full_boxes))
+
+        with stage("merge"):
+            return merge_detections(boxes, class_ids, confidences, nms_threshold, per_class_nms,
+                                    tiles=regions, image_size=(width, height))
+
+    def _postprocess(self, outs, width, height, conf_threshold=0.5, nms_threshold=0.4,
+                     per_class_nms=False):
+        """Convert raw output rows of one image into filtered detections"""
+        with stage("postprocess"):
+            boxes, class_ids, confidences = self._decode(outs, width, height, conf_threshold)
+        if len(boxes) == 0:
+            return [], [], []
+        with stage("nms"):
+            return self._nms(boxes, class_ids, confidences, conf_threshold, nms_threshold,
+                             per_class_nms)
+
+    def _decode(self, outs, width, height, conf_threshold=0.5):
+        """Select output rows above the threshold and convert them to pixel boxes
+
+        Rows are (center_x, center_y, w, h, objectness, class scores...) with
+        coordinates relative to the image size. Returns (x, y, w, h) boxes,
+        class ids and confidences as arrays.
+        """
+        detections = np.concatenate(outs)
+        scores = detections[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        mask = confidences > conf_threshold
+        detections = detections[mask]
+        class_ids = class_ids[mask]
+        confidences = confidences[mask].astype(np.float32)
+
+        # Rectangle coordinates, truncated to whole pixels
+        center_x = np.trunc(detections[:, 0] * width)
+        center_y = np.trunc(detections[:, 1] * height)
+        w = np.trunc(detections[:, 2] * width)
+        h = np.trunc(detections[:, 3] * height)
+        x = np.trunc(center_x - w / 2)
+        y = np.trunc(center_y - h / 2)
+        boxes = np.stack([x, y, w, h], axis=1).astype(np.int32)
+        return boxes, class_ids, confidences
+
+    def _nms(self, boxes, class_ids, confidences, conf_threshold=0.5, nms_threshold=0.4,
+             per_class_nms=False):
+        """Apply Non-Maximum Suppression, optionally only among boxes of the same class
+
+        Takes (x, y, w, h) boxes and returns (x1, y1, x2, y2) boxes.
+        """
+        if per_class_nms:
+            indices = cv2.dnn.NMSBoxesBatched(boxes, confidences, class_ids,
+                                              conf_threshold, nms_threshold)
+        else:
+            indices = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+        indices = np.asarray(indices, dtype=int).flatten()
+
+        boxes = boxes[indices]
+        boxes[:, 2:] += boxes[:, :2]  # (x, y, w, h) -> (x1, y1, x2, y2)
+        return list(boxes), class_ids[indices].tolist(), confidences[indices].tolist()
 
     def draw_annotations(self, image, boxes, class_ids, confidences):
         """Draw bounding boxes and labels on the image"""
-        h, w = image.shape[:2]
-        
-        for box, class_id, confidence in zip(boxes, class_ids, confidences):
-            x1, y1, x2, y2 = box.astype(int)
-            
-            # Draw bounding box
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
-            # Prepare label text
-            label = f"{self.classes[class_id]}: {confidence:.2f}"
-            
-            # Get text size and background size
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.6
-            thickness = 2
-            (text_width, text_height), baseline = cv2.getTextSize(label, font, font_scale, thickness)
-            
-            # Calculate text position (inside the box, near top)
-            text_x = x1 + 5
-            text_y = y1 + text_height + 10  # 10 pixels padding from top
-            
-            # Draw white background for text
-            cv2.rectangle(image, 
-                         (text_x - 2, text_y - text_height - 6),
-                         (text_x + text_width + 2, text_y + 2),
-                         (255, 255, 255), 
-                         -1)  # Filled rectangle
-            
-            # Draw text
-            cv2.putText(image, 
-                        label,
-                        (text_x, text_y),
-                        font,
-                        font_scale,
-                        (0, 0, 0),  # Black text
-                        thickness)
-        
-        return image 
\ No newline at end of file
+        return draw_annotations(image, boxes, class_ids, confidences, self.classes)
+
+
+def draw_annotations(image, boxes, class_ids, confidences, classes):
+    """Draw bounding boxes and labels on the image"""
+    return draw_detections(image, boxes, class_ids, confidences, classes)
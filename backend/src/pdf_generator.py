@@ -1,74 +1,159 @@
 from fpdf import FPDF
 import cv2
+import numpy as np
 from pathlib import Path
 import logging
-import tempfile
+import struct
 
 logger = logging.getLogger(__name__)
 
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+
+def jpeg_info(data):
+    """Read size and colour information from the header of JPEG bytes"""
+    pos = 2  # skip SOI marker
+    while pos + 4 <= len(data):
+        marker_high, marker_low = data[pos], data[pos + 1]
+        if marker_high != 0xFF or marker_low == 0xDA:  # SOS: no frame header found
+            break
+        if marker_low == 0xC8 or 0xD0 <= marker_low <= 0xD9 or 0xF0 <= marker_low <= 0xFD:
+            pos += 2  # standalone marker
+            continue
+        size, = struct.unpack_from('>H', data, pos + 2)
+        if marker_low in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                          0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):  # SOFn
+            bpc, height, width, layers = struct.unpack_from('>BHHB', data, pos + 4)
+            colspace = {3: 'DeviceRGB', 4: 'DeviceCMYK'}.get(layers, 'DeviceGray')
+            return {'w': width, 'h': height, 'cs': colspace, 'bpc': bpc}
+        pos += 2 + size
+    raise ValueError("No JPEG frame header found")
+
+
+def to_jpeg_bytes(data):
+    """Return encoded image bytes as JPEG, re-encoding only non-JPEG input"""
+    if data.startswith(JPEG_MAGIC):
+        return data
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+
 class PDFGenerator:
     def __init__(self, output_dir):
         self.output_dir = Path(output_dir)
 
-    def convert_to_jpg(self, image_path):
-        """Convert image to JPG format and save to a temporary file"""
+    def add_image_page(self, pdf, jpeg_bytes, title):
+        """Add a page with a JPEG image and title to the PDF"""
         try:
-            # Read the image
-            img = cv2.imread(str(image_path))
-            if img is None:
-                return None
-            
-            # Create temporary file with .jpg extension
-            temp = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            temp_path = temp.name
-            
-            # Save as JPG
-            cv2.imwrite(temp_path, img)
-            return temp_path
+            # Register the JPEG data directly so FPDF doesn't read it from disk
+            name = f"image{len(pdf.images) + 1}.jpg"
+            info = jpeg_info(jpeg_bytes)
+            info.update({'f': 'DCTDecode', 'data': jpeg_bytes, 'i': len(pdf.images) + 1})
+            pdf.images[name] = info
+
+            pdf.add_page()
+            pdf.set_font('Arial', 'B', 16)
+            pdf.cell(0, 10, title, 0, 1, 'C')
+            pdf.image(name, x=10, y=30, w=190)
+            return True
         except Exception as e:
-            logger.error(f"Error converting image to JPG: {e}")
-            return None
+            logger.error(f"Error adding {title} to PDF: {e}")
+            return False
 
-    def add_image_page(self, pdf, image_path, title):
-        """Add a page with an image and title to the PDF"""
+    def add_summary_page(self, pdf, detections, title='Detection Summary'):
+        """Add a page with per-class counts and a list of all detections
+
+        detections is a list of dicts with label, confidence and box keys.
+        """
         try:
             pdf.add_page()
             pdf.set_font('Arial', 'B', 16)
             pdf.cell(0, 10, title, 0, 1, 'C')
-            pdf.image(image_path, x=10, y=30, w=190)
+            pdf.set_font('Arial', '', 11)
+            pdf.cell(0, 8, f"Objects detected: {len(detections)}", 0, 1)
+            pdf.ln(2)
+
+            # Counts and confidence range per class
+            per_class = {}
+            for det in detections:
+                per_class.setdefault(det['label'], []).append(det['confidence'])
+            self._add_table(pdf, ['Class', 'Count', 'Min conf.', 'Avg conf.', 'Max conf.'],
+                            [[label, len(confs), f"{min(confs):.2f}",
+                              f"{sum(confs) / len(confs):.2f}", f"{max(confs):.2f}"]
+                             for label, confs in sorted(per_class.items(),
+                                                        key=lambda item: -len(item[1]))],
+                            [60, 30, 30, 30, 30])
+            pdf.ln(6)
+
+            # Individual detections, most confident first
+            self._add_table(pdf, ['#', 'Class', 'Confidence', 'Box (x1, y1, x2, y2)'],
+                            [[i + 1, det['label'], f"{det['confidence']:.2f}",
+                              ", ".join(str(v) for v in det['box'])]
+                             for i, det in enumerate(sorted(detections,
+                                                            key=lambda d: -d['confidence']))],
+                            [15, 60, 35, 70])
             return True
         except Exception as e:
             logger.error(f"Error adding {title} to PDF: {e}")
             return False
 
-    def create_pdf(self, original_image_path, annotated_image_path, output_filename):
-        temp_files = []  # Keep track of temporary files to clean up
+    def _add_table(self, pdf, header, rows, widths):
+        """Draw a simple table, repeating the header on page breaks"""
+        def draw_header():
+            pdf.set_font('Arial', 'B', 11)
+            for text, width in zip(header, widths):
+                pdf.cell(width, 8, text, 1, 0, 'C')
+            pdf.ln()
+            pdf.set_font('Arial', '', 10)
+
+        draw_header()
+        for row in rows:
+            if pdf.get_y() + 7 > pdf.page_break_trigger:
+                pdf.add_page()
+                draw_header()
+            for value, width in zip(row, widths):
+                pdf.cell(width, 7, str(value), 1, 0, 'C')
+            pdf.ln()
+
+    def create_pdf(self, original_image_path, annotated_image_path, output_filename,
+                   detections=None):
+        """Create a report from image files"""
         try:
-            # Convert paths to Path objects and validate
-            original_image_path = Path(original_image_path)
-            annotated_image_path = Path(annotated_image_path)
-            
-            for path, desc in [(original_image_path, "Original"), (annotated_image_path, "Annotated")]:
+            images = []
+            for path, desc in [(Path(original_image_path), "Original"),
+                               (Path(annotated_image_path), "Annotated")]:
                 if not path.exists():
                     logger.error(f"{desc} image not found: {path}")
                     return False
-
-            # Convert images to JPG format
-            image_paths = []
-            for path, desc in [(original_image_path, "original"), (annotated_image_path, "annotated")]:
-                jpg_path = self.convert_to_jpg(path)
-                if not jpg_path:
-                    logger.error(f"Failed to convert {desc} image to JPG: {path}")
+                jpeg_bytes = to_jpeg_bytes(path.read_bytes())
+                if jpeg_bytes is None:
+                    logger.error(f"Failed to convert {desc.lower()} image to JPG: {path}")
                     return False
-                temp_files.append(jpg_path)
-                image_paths.append(jpg_path)
+                images.append(jpeg_bytes)
+        except Exception as e:
+            logger.error(f"Error creating PDF: {e}")
+            return False
+
+        return self.create_pdf_from_bytes(images[0], images[1], output_filename, detections)
+
+    def create_pdf_from_bytes(self, original_jpeg, annotated_jpeg, output_filename,
+                              detections=None):
+        """Create a report from in-memory JPEG images
 
+        If detections are given, a summary page is added after the images.
+        """
+        try:
             # Create PDF
             pdf = FPDF()
             
             # Add both images to PDF
-            if not (self.add_image_page(pdf, image_paths[0], 'Original Image') and 
-                   self.add_image_page(pdf, image_paths[1], 'Annotated Image')):
+            if not (self.add_image_page(pdf, original_jpeg, 'Original Image') and 
+                   self.add_image_page(pdf, annotated_jpeg, 'Annotated Image')):
+                return False
+
+            if detections is not None and not self.add_summary_page(pdf, detections):
                 return False
 
             # Save PDF
@@ -84,10 +169,3 @@ class PDFGenerator:
         except Exception as e:
             logger.error(f"Error creating PDF: {e}")
             return False
-        finally:
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    Path(temp_file).unlink()
-                except Exception:
-                    pass 
\ No newline at end of file
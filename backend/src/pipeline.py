@@ -0,0 +1,162 @@
+import json
+
+import cv2
+import numpy as np
+
+from metrics import stage
+from object_detection import draw_annotations
+from pdf_generator import JPEG_MAGIC, jpeg_info
+from rendering import draw_detections, encode_overlay_png
+from utils import save_image
+
+# Jobs executed on inference pool workers take the worker's detector as
+# their first argument and must stay at module level so they can be pickled.
+# The remaining helpers are plain CPU work run in the request threadpool.
+
+
+def warm_up(detector, input_size=None):
+    """Run a warm-up forward pass on a worker's detector"""
+    detector.warm_up(input_size)
+
+
+def detect_batch(detector, images, options=None, input_size=None):
+    """Run one batched forward pass and return detections per image"""
+    return detector.detect_objects_batch(images, options, input_size)
+
+
+def detect_tiled(detector, image, options=None, input_size=None, tiling=None):
+    """Detect objects in overlapping tiles of a large image"""
+    return detector.detect_objects_tiled(image, input_size=input_size, **(tiling or {}),
+                                         **(options or {}))
+
+
+def detect_and_save(detector, image, output_path, input_size=None, options=None):
+    """Detect objects, save the annotated image and return JSON detections"""
+    detections = detector.detect_objects(image, input_size=input_size, **(options or {}))
+    boxes, class_ids, confidences = detections
+    annotated_image = draw_annotations(image, boxes, class_ids, confidences, detector.classes)
+    if not save_image(annotated_image, output_path):
+        raise ValueError(f"Could not write annotated image: {output_path}")
+    return detections_to_json(detections, detector.classes)
+
+
+def decode_image(contents):
+    """Decode encoded image bytes, returning None for invalid data"""
+    with stage("decode"):
+        nparr = np.frombuffer(contents, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def encode_annotated(image, detections, classes):
+    """Draw detections on the image (in place) and encode it once as JPEG"""
+    boxes, class_ids, confidences = detections
+    with stage("annotate"):
+        annotated_image = draw_annotations(image, boxes, class_ids, confidences, classes)
+    with stage("encode"):
+        _, buffer = cv2.imencode('.jpg', annotated_image)
+    return buffer.tobytes()
+
+
+def detections_to_json(detections, classes):
+    """Convert (boxes, class_ids, confidences) into JSON-friendly dicts"""
+    boxes, class_ids, confidences = detections
+    return [
+        {
+            "box": [int(v) for v in box],
+            "class_id": int(class_id),
+            "label": classes[class_id],
+            "confidence": round(float(confidence), 4),
+        }
+        for box, class_id, confidence in zip(boxes, class_ids, confidences)
+    ]
+
+
+def encode_annotated_frame(image, detections, classes, scale=0.5, quality=75, track_ids=None):
+    """Draw detections found on a downscaled frame and encode it as JPEG"""
+    boxes, class_ids, confidences = detections
+
+    # Only draw annotations if objects were detected
+    if len(boxes) > 0:
+        # Scale boxes back to original size
+        boxes = [box / scale for box in boxes]  # boxes are already numpy arrays
+        with stage("annotate"):
+            image = draw_detections(image, boxes, class_ids, confidences, classes,
+                                    track_ids=track_ids)
+
+    # Convert back to bytes with reduced quality
+    with stage("encode"):
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def encode_frame_overlay(size, detections, classes, scale=0.5, track_ids=None):
+    """Encode detections found on a downscaled frame as a transparent PNG"""
+    boxes, class_ids, confidences = detections
+    boxes = [box / scale for box in boxes]
+    height, width = size
+    with stage("annotate"):
+        return encode_overlay_png(height, width, boxes, class_ids, confidences, classes, track_ids)
+
+
+def frame_boxes(size, detections, classes, scale=0.5, track_ids=None):
+    """Detections found on a downscaled frame, in original frame coordinates"""
+    boxes, class_ids, confidences = detections
+    height, width = size
+    items = detections_to_json(([box / scale for box in boxes], class_ids, confidences), classes)
+    if track_ids is not None:
+        for item, track_id in zip(items, track_ids):
+            item["track_id"] = int(track_id)
+    return {"width": width, "height": height, "detections": items}
+
+
+def encode_frame_output(output, image, size, detections, classes, scale=0.5, quality=75,
+                        track_ids=None):
+    """Encode a frame's detections as output "image", "overlay" or "boxes"
+
+    image is only needed for "image" output and size only for the others.
+    """
+    if output == "image":
+        return encode_annotated_frame(image, detections, classes, scale, quality, track_ids)
+    if output == "overlay":
+        return encode_frame_overlay(size, detections, classes, scale, track_ids)
+    return json.dumps(frame_boxes(size, detections, classes, scale, track_ids)).encode()
+
+
+def frame_size(contents):
+    """(height, width) of an encoded frame, read from the header for JPEG"""
+    if contents.startswith(JPEG_MAGIC):
+        try:
+            info = jpeg_info(contents)
+            return info['h'], info['w']
+        except (ValueError, IndexError):
+            pass
+    image = decode_image(contents)
+    return image.shape[:2] if image is not None else None
+
+
+def prepare_frame_small(contents, scale=0.5):
+    """Decode only a downscaled frame, returning it with the original (height, width)
+
+    For outputs that never draw on the full frame. JPEG decoding at half
+    size skips most of the IDCT work, so it is cheaper than decode + resize.
+    """
+    if scale != 0.5:
+        image, small = prepare_frame(contents, scale)
+        return small, image.shape[:2] if image is not None else None
+    with stage("decode"):
+        small = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+    if small is None:
+        return None, None
+    if contents.startswith(JPEG_MAGIC):
+        return small, frame_size(contents)
+    return small, (round(small.shape[0] / scale), round(small.shape[1] / scale))
+
+
+def prepare_frame(contents, scale=0.5):
+    """Decode a frame and return it with a downscaled copy for detection"""
+    image = decode_image(contents)
+    if image is None:
+        return None, None
+    # Resize image for faster processing
+    with stage("resize"):
+        return image, cv2.resize(image, None, fx=scale, fy=scale)
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+import config
+from inference_backends import quantized_path
+from model_registry import get_model_spec
+
+def quantize_model(name):
+    """Write an INT8 copy of an ONNX model for the onnxruntime-int8 backend
+
+    Weights are quantized ahead of time and activations dynamically at run
+    time, so no calibration images are needed.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    models_dir = Path(config.MODELS_DIR)
+    spec = get_model_spec(name, models_dir)
+    if spec["config"]:
+        print(f"{name} is a Darknet model; only ONNX models can be quantized")
+        return False
+
+    model_path = models_dir / spec["weights"]
+    output_path = quantized_path(model_path)
+    print(f"Quantizing {model_path.name}...")
+    quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QInt8)
+    print(f"Wrote {output_path.name} "
+          f"({model_path.stat().st_size / 1e6:.1f} MB -> {output_path.stat().st_size / 1e6:.1f} MB)")
+    return True
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python src/quantize_model.py <model> [<model> ...]")
+        sys.exit(1)
+    if all([quantize_model(name) for name in sys.argv[1:]]):
+        print("All models quantized successfully!")
+    else:
+        print("Error quantizing models!")
+        sys.exit(1)
@@ -0,0 +1,75 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.6
+THICKNESS = 2
+BOX_COLOR = (0, 255, 0)
+
+
+@lru_cache(maxsize=4096)
+def label_sprite(label):
+    """Render a label once as black text on a white background
+
+    Labels are "<class>: <confidence:.2f>", so there are at most 101 per
+    class; each is rasterized on first use and then only copied.
+    """
+    (text_width, text_height), baseline = cv2.getTextSize(label, FONT, FONT_SCALE, THICKNESS)
+    sprite = np.full((text_height + baseline + 8, text_width + 5, 3), 255, dtype=np.uint8)
+    cv2.putText(sprite, label, (2, text_height + 6), FONT, FONT_SCALE, (0, 0, 0), THICKNESS)
+    sprite.setflags(write=False)
+    return sprite
+
+
+def _paste(canvas, sprite, x, y):
+    """Copy sprite into canvas at (x, y), clipped to the canvas"""
+    h, w = canvas.shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + sprite.shape[1], w), min(y + sprite.shape[0], h)
+    if x1 >= x2 or y1 >= y2:
+        return
+    region = sprite[y1 - y:y2 - y, x1 - x:x2 - x]
+    if canvas.shape[2] == 4:
+        canvas[y1:y2, x1:x2, :3] = region
+        canvas[y1:y2, x1:x2, 3] = 255
+    else:
+        canvas[y1:y2, x1:x2] = region
+
+
+def draw_detections(image, boxes, class_ids, confidences, classes, copy=False, track_ids=None):
+    """Draw bounding boxes and labels on the image
+
+    Draws in place unless copy is true. Boxes are (x1, y1, x2, y2); the
+    label sits inside the box near its top-left corner and includes the
+    track ID when track_ids are given.
+    """
+    if copy:
+        image = image.copy()
+    color = BOX_COLOR + (255,) if image.shape[2] == 4 else BOX_COLOR
+    if track_ids is None:
+        names = [classes[class_id] for class_id in class_ids]
+    else:
+        names = [f"{classes[class_id]} #{track_id}" for class_id, track_id in zip(class_ids, track_ids)]
+
+    for box, name, confidence in zip(boxes, names, confidences):
+        x1, y1, x2, y2 = np.asarray(box).astype(int)
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        _paste(image, label_sprite(f"{name}: {confidence:.2f}"), x1 + 3, y1 + 4)
+
+    return image
+
+
+def render_overlay(height, width, boxes, class_ids, confidences, classes, track_ids=None):
+    """Draw detections on a transparent BGRA canvas of the given size"""
+    overlay = np.zeros((height, width, 4), dtype=np.uint8)
+    return draw_detections(overlay, boxes, class_ids, confidences, classes, track_ids=track_ids)
+
+
+def encode_overlay_png(height, width, boxes, class_ids, confidences, classes, track_ids=None):
+    """Transparent PNG with only the boxes and labels, for client-side compositing"""
+    overlay = render_overlay(height, width, boxes, class_ids, confidences, classes, track_ids)
+    # Mostly transparent, so fast compression is nearly as small as the default
+    _, buffer = cv2.imencode('.png', overlay, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    return buffer.tobytes()
@@ -0,0 +1,287 @@
+import logging
+import zlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from metrics import stage
+from pdf_generator import JPEG_MAGIC, jpeg_info
+
+logger = logging.getLogger(__name__)
+
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89  # A4 in points
+MARGIN = 40
+ROW_HEIGHT = 16
+REDUCED_READ_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                      8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def _escape(text):
+    """Encode text as a PDF string literal body for the standard fonts"""
+    return (str(text).encode("cp1252", "replace")
+            .replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)"))
+
+
+def _fit(text, width, size):
+    """Shorten text so it roughly fits width points at the given font size"""
+    text = str(text)
+    max_chars = max(4, int(width / (size * 0.55)))
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def _text(x, y, text, size=10, bold=False):
+    return b"BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET" % (
+        b"F2" if bold else b"F1", size, x, y, _escape(text))
+
+
+class PDFWriter:
+    """Minimal PDF writer that emits each object as soon as it is complete
+
+    Written bytes collect in a buffer until take() hands them out, so a
+    document can be streamed while it is produced. Only object offsets and
+    page ids are kept until close() writes the page tree and the
+    cross-reference table.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._offset = 0
+        self._offsets = [None]  # by object number; 0 is the head of the free list
+        self._page_ids = []
+        self._image_count = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._pages_id = self._reserve()  # written last, once all pages are known
+        fonts = [self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s "
+                              b"/Encoding /WinAnsiEncoding >>" % name)
+                 for name in (b"Helvetica", b"Helvetica-Bold")]
+        self._fonts = b"/F1 %d 0 R /F2 %d 0 R" % tuple(fonts)
+
+    def _write(self, data):
+        self._buffer.append(data)
+        self._offset += len(data)
+
+    def _reserve(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _object(self, body, stream=None, obj_id=None):
+        obj_id = obj_id or self._reserve()
+        self._offsets[obj_id] = self._offset
+        self._write(b"%d 0 obj\n" % obj_id)
+        self._write(body)
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+        return obj_id
+
+    def add_image(self, jpeg_bytes):
+        """Embed JPEG bytes as-is and return (name, width, height) for add_page"""
+        info = jpeg_info(jpeg_bytes)
+        decode = b" /Decode [1 0 1 0 1 0 1 0]" if info["cs"] == "DeviceCMYK" else b""
+        obj_id = self._object(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /%s "
+            b"/BitsPerComponent %d /Filter /DCTDecode%s /Length %d >>" % (
+                info["w"], info["h"], info["cs"].encode(), info["bpc"], decode,
+                len(jpeg_bytes)),
+            jpeg_bytes)
+        self._image_count += 1
+        return (b"Im%d" % self._image_count, obj_id), info["w"], info["h"]
+
+    def add_page(self, operations, images=()):
+        """Add a page drawn by a list of content stream operations"""
+        content = zlib.compress(b"\n".join(operations))
+        content_id = self._object(b"<< /Filter /FlateDecode /Length %d >>" % len(content),
+                                  content)
+        xobjects = b" ".join(b"/%s %d 0 R" % image for image in images)
+        self._page_ids.append(self._object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /Font << %s >> /XObject << %s >> >> /Contents %d 0 R >>" % (
+                self._pages_id, PAGE_WIDTH, PAGE_HEIGHT, self._fonts, xobjects, content_id)))
+
+    def close(self, title=None):
+        """Write the page tree, catalog and cross-reference table"""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)),
+                     obj_id=self._pages_id)
+        info_id = self._object(b"<< /Title (%s) /Producer (YOLO Object Detection) >>"
+                               % _escape(title or ""))
+        catalog_id = self._object(b"<< /Type /Catalog /Pages %d 0 R >>" % self._pages_id)
+
+        xref_offset = self._offset
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self._offsets))
+        self._write(b"".join(b"%010d 00000 n \n" % offset for offset in self._offsets[1:]))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (len(self._offsets), catalog_id, info_id, xref_offset))
+
+    def take(self):
+        """Return and forget the bytes written since the last call"""
+        data = b"".join(self._buffer)
+        self._buffer = []
+        return data
+
+
+def page_jpeg(data, max_width, max_height, quality=80):
+    """JPEG bytes of an encoded image that fit within max_width x max_height pixels
+
+    JPEGs that already fit are embedded unchanged. Anything else is decoded
+    once, at a reduced size when the JPEG decoder can do that, and scaled
+    down with area interpolation.
+    """
+    reduction = 1
+    if data.startswith(JPEG_MAGIC):
+        info = jpeg_info(data)
+        scale = min(max_width / info["w"], max_height / info["h"])
+        if scale >= 1 and info["cs"] != "DeviceCMYK":
+            return data
+        for factor in (8, 4, 2):
+            if factor <= 1 / scale:
+                reduction = factor
+                break
+
+    buffer = np.frombuffer(data, np.uint8)
+    image = cv2.imdecode(buffer, REDUCED_READ_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+    if image is None:
+        raise ValueError("Could not decode image")
+    height, width = image.shape[:2]
+    scale = min(max_width / width, max_height / height)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def _class_counts(detections):
+    counts = {}
+    for det in detections:
+        counts[det["label"]] = counts.get(det["label"], 0) + 1
+    return sorted(counts.items(), key=lambda item: -item[1])
+
+
+class _Pages:
+    """Lay out lines and tables top to bottom, starting new pages as needed"""
+
+    def __init__(self, writer, title):
+        self.writer = writer
+        self.title = title
+        self.operations = []
+        self.y = None
+
+    def _new_page(self):
+        self.flush()
+        self.operations.append(_text(MARGIN, PAGE_HEIGHT - MARGIN - 16, self.title, 16, True))
+        self.y = PAGE_HEIGHT - MARGIN - 40
+
+    def flush(self):
+        if self.operations:
+            self.writer.add_page(self.operations)
+            self.operations = []
+
+    def line(self, text, size=11, bold=False, space=ROW_HEIGHT):
+        if self.y is None or self.y - space < MARGIN:
+            self._new_page()
+        self.y -= space
+        self.operations.append(_text(MARGIN, self.y + 4, text, size, bold))
+
+    def table(self, header, rows, widths):
+        """Draw a table, repeating the header after page breaks"""
+        def draw_row(values, bold):
+            if self.y is None or self.y - ROW_HEIGHT < MARGIN:
+                self._new_page()
+                if not bold:
+                    draw_row(header, True)
+            self.y -= ROW_HEIGHT
+            x = MARGIN
+            for value, width in zip(values, widths):
+                self.operations.append(b"%.2f %.2f %.2f %.2f re S" % (x, self.y, width, ROW_HEIGHT))
+                self.operations.append(_text(x + 3, self.y + 4, _fit(value, width - 6, 9), 9, bold))
+                x += width
+
+        draw_row(header, True)
+        for row in rows:
+            draw_row(row, False)
+        self.y -= ROW_HEIGHT / 2
+
+
+def iter_report(items, title="Detection Report", dpi=150, quality=80):
+    """Generate a multi-image PDF report, yielding its bytes page by page
+
+    items is an iterable of dicts with a name, an image (encoded bytes or a
+    path, usually the annotated image) and its detections. Items are read
+    one at a time and each image is downscaled once to the resolution it is
+    printed at, so memory stays bounded however many images there are.
+    One page per image is followed by summary tables of detections per
+    class and per image.
+    """
+    writer = PDFWriter()
+    image_box = (PAGE_WIDTH - 2 * MARGIN, PAGE_HEIGHT - 2 * MARGIN - 90)
+    max_pixels = [int(side / 72 * dpi) for side in image_box]
+    per_image = []  # (name, detection count, class counts)
+    per_class = {}  # label -> [count, images, min conf, conf sum, max conf]
+
+    for item in items:
+        name, detections = item["name"], item["detections"]
+        counts = _class_counts(detections)
+        per_image.append((name, len(detections), counts))
+        for label, count in counts:
+            per_class.setdefault(label, [0, 0, 1.0, 0.0, 0.0])[1] += 1
+        for det in detections:
+            entry = per_class[det["label"]]
+            entry[0] += 1
+            entry[2] = min(entry[2], det["confidence"])
+            entry[3] += det["confidence"]
+            entry[4] = max(entry[4], det["confidence"])
+
+        operations = [_text(MARGIN, PAGE_HEIGHT - MARGIN - 16,
+                            _fit(name, image_box[0], 14), 14, True)]
+        summary = ", ".join(f"{label}: {count}" for label, count in counts) or "none"
+        operations.append(_text(MARGIN, MARGIN + 30, f"Objects detected: {len(detections)}", 11))
+        operations.append(_text(MARGIN, MARGIN + 12, _fit(summary, image_box[0], 10), 10))
+        images = []
+        try:
+            with stage("pdf"):
+                data = item["image"]
+                if not isinstance(data, bytes):
+                    data = Path(data).read_bytes()
+                image, width, height = writer.add_image(page_jpeg(data, *max_pixels, quality))
+            # Fit the image into the box below the title, keeping its aspect ratio
+            scale = min(image_box[0] / width, image_box[1] / height)
+            draw_width, draw_height = width * scale, height * scale
+            x = MARGIN + (image_box[0] - draw_width) / 2
+            y = PAGE_HEIGHT - MARGIN - 30 - draw_height
+            operations.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q" % (
+                draw_width, draw_height, x, y, image[0]))
+            images.append(image)
+        except Exception as e:
+            logger.error(f"Error adding {name} to report: {e}")
+            operations.append(_text(MARGIN, PAGE_HEIGHT - MARGIN - 50, "Image unavailable", 11))
+        writer.add_page(operations, images)
+        yield writer.take()
+
+    with stage("pdf"):
+        pages = _Pages(writer, title)
+        pages.line(f"Images: {len(per_image)}")
+        pages.line(f"Objects detected: {sum(count for _, count, _ in per_image)}")
+        pages.line("Detections per class", 12, True, ROW_HEIGHT * 1.5)
+        pages.table(["Class", "Count", "Images", "Min conf.", "Avg conf.", "Max conf."],
+                    [[label, count, images, f"{low:.2f}", f"{total / count:.2f}", f"{high:.2f}"]
+                     for label, (count, images, low, total, high)
+                     in sorted(per_class.items(), key=lambda item: -item[1][0])],
+                    [165, 60, 60, 70, 80, 80])
+        pages.line("Detections per image", 12, True, ROW_HEIGHT * 1.5)
+        pages.table(["#", "Image", "Objects", "Classes"],
+                    [[i + 1, name, count, ", ".join(f"{label}: {n}" for label, n in counts)]
+                     for i, (name, count, counts) in enumerate(per_image)],
+                    [35, 190, 55, 235])
+        pages.flush()
+        writer.close(title)
+    yield writer.take()
+
+
+def write_report(path, items, **options):
+    """Write a multi-image report to a file"""
+    with open(path, "wb") as f:
+        for chunk in iter_report(items, **options):
+            f.write(chunk)
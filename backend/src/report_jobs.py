@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import stage
+from pdf_generator import PDFGenerator, to_jpeg_bytes
+
+logger = logging.getLogger(__name__)
+
+RESULT_FILENAME = "result.json"
+
+
+class ReportJobs:
+    """Generate PDF reports in the background, or on demand when downloaded
+
+    Each request directory holds the original upload, the annotated JPEG and
+    a result.json with the detections, which is all a report needs. Reports
+    can therefore be (re)built at any time, even after a server restart.
+    """
+
+    def __init__(self, store, workers=1):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._jobs = {}  # request_id -> Future of a running or failed job
+        self._lock = threading.RLock()
+
+    def submit(self, request_id):
+        """Start building the report for a request unless it already exists or is running"""
+        with self._lock:
+            future = self._jobs.get(request_id)
+            if future is not None and (not future.done() or future.exception() is None):
+                return future
+            future = self._executor.submit(self._build, request_id)
+            self._jobs[request_id] = future
+            future.add_done_callback(lambda f: self._finished(request_id, f))
+            return future
+
+    def _finished(self, request_id, future):
+        # Keep failed jobs around so their error can be reported
+        if future.exception() is None:
+            with self._lock:
+                if self._jobs.get(request_id) is future:
+                    del self._jobs[request_id]
+
+    def _build(self, request_id):
+        request_dir = self.store.path(request_id)
+        result = self.load_result(request_id)
+        pdf_path = request_dir / result["pdf_filename"]
+        if pdf_path.exists():
+            return pdf_path
+
+        # Requests stored before uploads were renamed keep the original name
+        original_name = result.get("original_filename", result["filename"])
+        original_jpeg = to_jpeg_bytes((request_dir / original_name).read_bytes())
+        annotated_jpeg = (request_dir / result["annotated_filename"]).read_bytes()
+        if original_jpeg is None:
+            raise RuntimeError(f"Could not read original image for {request_id}")
+
+        # Write to a temporary name so downloads never see a partial file
+        partial_name = f".{result['pdf_filename']}.partial"
+        pdf_generator = PDFGenerator(request_dir)
+        with stage("pdf"):
+            created = pdf_generator.create_pdf_from_bytes(original_jpeg, annotated_jpeg,
+                                                          partial_name, result["detections"])
+        if not created:
+            raise RuntimeError(f"Failed to create report for {request_id}")
+        (request_dir / partial_name).replace(pdf_path)
+        self.store.refresh(request_id)
+        return pdf_path
+
+    def load_result(self, request_id):
+        """Read the stored detection result of a request"""
+        with (self.store.path(request_id) / RESULT_FILENAME).open() as f:
+            return json.load(f)
+
+    def iter_items(self, request_ids):
+        """Report builder items for stored requests, read one at a time
+
+        Requests whose files have gone, or that hold no image result, are
+        skipped.
+        """
+        for request_id in request_ids:
+            try:
+                result = self.load_result(request_id)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {request_id} in report: {e}")
+                continue
+            self.store.touch(request_id)
+            yield {"name": result["filename"], "detections": result["detections"],
+                   "image": self.store.path(request_id) / result["annotated_filename"]}
+
+    def status(self, request_id):
+        """Report state: not_found, pending, running, done, failed or not_started"""
+        request_dir = self.store.path(request_id)
+        if not (request_dir / RESULT_FILENAME).exists():
+            return {"request_id": request_id, "status": "not_found"}
+
+        result = self.load_result(request_id)
+        status = {"request_id": request_id, "pdf_filename": result["pdf_filename"]}
+        future = self._jobs.get(request_id)
+        if future is not None and not future.done():
+            status["status"] = "running" if future.running() else "pending"
+        elif (request_dir / result["pdf_filename"]).exists():
+            status["status"] = "done"
+        elif future is not None and future.exception() is not None:
+            status.update(status="failed", error=str(future.exception()))
+        else:
+            status["status"] = "not_started"
+        return status
+
+    async def ensure(self, request_id):
+        """Wait for the report of a request, starting it if needed, and return its path"""
+        return await asyncio.wrap_future(self.submit(request_id))
+
+    def active(self, request_id):
+        """Whether a report for the request is pending or being built"""
+        future = self._jobs.get(request_id)
+        return future is not None and not future.done()
+
+    def forget(self, request_id):
+        """Drop job state for a request whose files were removed"""
+        with self._lock:
+            self._jobs.pop(request_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(contents, **settings):
+    """Hash image bytes together with everything that affects the result"""
+    digest = hashlib.blake2b(contents, digest_size=20)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache of detection results keyed by image content and settings
+
+    Entries are dicts with an "annotated" JPEG (bytes) and JSON-friendly
+    metadata such as the detections. The in-memory tier is capped by the
+    total size of the entries; with disk_dir set, entries are also written
+    there (capped by disk_max_bytes) and survive eviction and restarts.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._memory = OrderedDict()  # key -> (entry, size)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def _load_disk_index(self):
+        paths = sorted(self.disk_dir.glob("*.jpg"), key=lambda p: p.stat().st_mtime)
+        for path in paths:
+            meta_path = path.with_suffix(".json")
+            if meta_path.exists():
+                size = path.stat().st_size + meta_path.stat().st_size
+                self._disk[path.stem] = size
+                self._disk_bytes += size
+        logger.info(f"Result cache: {len(self._disk)} entries on disk in {self.disk_dir}")
+
+    @staticmethod
+    def _entry_size(entry):
+        meta = {k: v for k, v in entry.items() if k != "annotated"}
+        return len(entry["annotated"]) + len(json.dumps(meta))
+
+    def get(self, key):
+        """Return the cached entry for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key][0]
+
+            if key in self._disk:
+                entry = self._read_disk(key)
+                if entry is not None:
+                    self._disk.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._put_memory(key, entry)
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def put(self, key, entry):
+        """Store an entry in memory and, if configured, on disk"""
+        with self._lock:
+            self._put_memory(key, entry)
+            if self.disk_dir and key not in self._disk:
+                self._write_disk(key, entry)
+
+    def update(self, key, **fields):
+        """Change metadata of an existing entry (e.g. a new request id)"""
+        with self._lock:
+            if key in self._memory:
+                self._memory[key][0].update(fields)
+            if self.disk_dir and key in self._disk:
+                meta_path = self.disk_dir / f"{key}.json"
+                meta = json.loads(meta_path.read_text())
+                meta.update(fields)
+                meta_path.write_text(json.dumps(meta))
+
+    def _put_memory(self, key, entry):
+        if self.max_bytes <= 0:
+            return
+        size = self._entry_size(entry)
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (entry, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _read_disk(self, key):
+        try:
+            meta = json.loads((self.disk_dir / f"{key}.json").read_text())
+            meta["annotated"] = (self.disk_dir / f"{key}.jpg").read_bytes()
+            return meta
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+
+    def _write_disk(self, key, entry):
+        try:
+            meta = {k: v for k, v in entry.items() if k != "annotated"}
+            (self.disk_dir / f"{key}.jpg").write_bytes(entry["annotated"])
+            (self.disk_dir / f"{key}.json").write_text(json.dumps(meta))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            return
+        self._disk[key] = self._entry_size(entry)
+        self._disk_bytes += self._disk[key]
+        while self._disk_bytes > self.disk_max_bytes and len(self._disk) > 1:
+            evicted, evicted_size = self._disk.popitem(last=False)
+            self._disk_bytes -= evicted_size
+            for suffix in (".jpg", ".json"):
+                (self.disk_dir / f"{evicted}{suffix}").unlink(missing_ok=True)
+
+    def stats(self):
+        """Hit/miss counters and current size of both tiers"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_max_bytes": self.max_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+        }
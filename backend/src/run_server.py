@@ -1,4 +1,11 @@
+import os
+from pathlib import Path
+
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # Reloading restarts the server, and reloads every model, on each code change;
+    # set YOLO_RELOAD=0 outside development
+    reload = os.environ.get("YOLO_RELOAD", "1") == "1"
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=reload,
+                app_dir=str(Path(__file__).resolve().parent))
@@ -0,0 +1,148 @@
+import cv2
+import numpy as np
+
+BORDER_MARGIN = 2  # pixels between a box edge and a tile edge for the box to count as cut off
+AXIS_MATCH_THRESHOLD = 0.5  # overlap along the border of two parts of one object
+
+
+def tile_offsets(length, tile_size, overlap):
+    """Start positions of tiles covering length, the last one flush with the end"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    offsets = list(range(0, length - tile_size, step))
+    offsets.append(length - tile_size)
+    return offsets
+
+
+def tile_grid(height, width, tile_size, overlap=0.2):
+    """(x, y) of the top-left corner of each overlapping tile"""
+    return [(x, y)
+            for y in tile_offsets(height, tile_size, overlap)
+            for x in tile_offsets(width, tile_size, overlap)]
+
+
+def _cut_sides(boxes, regions, width, height):
+    """Per box, whether it ends at the left, top, right or bottom edge of its tile
+
+    Only tile edges inside the image count: an object ending at the image
+    border is not cut off.
+    """
+    interior = np.stack([regions[:, 0] > 0, regions[:, 1] > 0,
+                         regions[:, 2] < width, regions[:, 3] < height], axis=1)
+    return (np.abs(boxes - regions) <= BORDER_MARGIN) & interior
+
+
+def _overlap_1d(low, high):
+    """Pairwise IoU of intervals"""
+    intersection = np.clip(np.minimum(high[:, None], high[None, :])
+                           - np.maximum(low[:, None], low[None, :]), 0, None)
+    union = np.maximum(high[:, None], high[None, :]) - np.minimum(low[:, None], low[None, :])
+    return intersection / np.maximum(union, 1e-6)
+
+
+def _part_pairs(boxes, cut):
+    """Pairs of boxes that look like two parts of one object split by a tile border
+
+    The first box must be cut at its right (bottom) edge and the second at
+    its left (top) edge, each cut lying within the other box, with the
+    boxes lined up along the border.
+    """
+    x1, y1, x2, y2 = boxes.T
+    pairs = np.zeros((len(boxes), len(boxes)), dtype=bool)
+    for start, end, other_start, other_end, before, after in (
+            (x1, x2, y1, y2, 2, 0), (y1, y2, x1, x2, 3, 1)):
+        meets = ((start[:, None] <= start[None, :]) & (start[None, :] < end[:, None])
+                 & (end[:, None] <= end[None, :]))
+        pairs |= (cut[:, None, before] & cut[None, :, after] & meets
+                  & (_overlap_1d(other_start, other_end) >= AXIS_MATCH_THRESHOLD))
+    return pairs | pairs.T
+
+
+def _join_parts(boxes, confidences, regions, cut):
+    """Replace groups of cut-off parts from different tiles by their union
+
+    Returns the joined boxes and, for each, the index of its most confident
+    part.
+    """
+    pairs = _part_pairs(boxes, cut)
+    pairs &= (regions[:, None, :] != regions[None, :, :]).any(axis=2)
+
+    # Connected groups of parts, so objects spanning several tiles are joined whole
+    parent = list(range(len(boxes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(pairs))):
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(find(i), []).append(i)
+
+    joined, keep = [], []
+    for members in groups.values():
+        members = np.array(members)
+        joined.append(np.concatenate([boxes[members, :2].min(axis=0),
+                                      boxes[members, 2:].max(axis=0)]))
+        keep.append(members[np.argmax(confidences[members])])
+    return np.array(joined).reshape(-1, 4), np.array(keep, dtype=int)
+
+
+def merge_detections(boxes, class_ids, confidences, nms_threshold=0.4, per_class_nms=False,
+                     tiles=None, image_size=None):
+    """Global NMS over detections collected from overlapping tiles
+
+    tiles gives, for each box, the (x1, y1, x2, y2) region of the tile it
+    was found in, or None for boxes from a pass over the whole image;
+    image_size is (width, height). An object crossing a tile border is
+    found by each tile as a part cut off at that border: such parts of the
+    same class from different tiles are joined into their union. All boxes
+    then go through the usual IoU NMS (across classes unless
+    per_class_nms), which also removes objects seen whole by several tiles
+    or by the whole-image pass. Tile boxes are clipped to their tile.
+    Boxes are (x1, y1, x2, y2).
+    """
+    if len(boxes) == 0:
+        return [], [], []
+    boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    class_ids = np.asarray(class_ids, dtype=np.int32)
+    confidences = np.asarray(confidences, dtype=np.float32)
+
+    if tiles is not None:
+        from_tile = np.array([tile is not None for tile in tiles])
+        regions = np.array([tile if tile is not None else (0, 0, 0, 0) for tile in tiles],
+                           dtype=np.float32).reshape(-1, 4)
+        # Boxes of objects cut off by a tile often reach past the tile; clip
+        # them so their cut edge lies on the border
+        boxes[from_tile, :2] = np.maximum(boxes[from_tile, :2], regions[from_tile, :2])
+        boxes[from_tile, 2:] = np.minimum(boxes[from_tile, 2:], regions[from_tile, 2:])
+        cut = _cut_sides(boxes, regions, *image_size) & from_tile[:, None]
+        is_part = cut.any(axis=1)
+
+        merged_boxes = [boxes[~is_part]]
+        merged_class_ids = [class_ids[~is_part]]
+        merged_confidences = [confidences[~is_part]]
+        for class_id in np.unique(class_ids[is_part]):
+            members = np.flatnonzero(is_part & (class_ids == class_id))
+            joined, keep = _join_parts(boxes[members], confidences[members],
+                                       regions[members], cut[members])
+            merged_boxes.append(joined)
+            merged_class_ids.append(class_ids[members[keep]])
+            merged_confidences.append(confidences[members[keep]])
+        boxes = np.concatenate(merged_boxes)
+        class_ids = np.concatenate(merged_class_ids)
+        confidences = np.concatenate(merged_confidences)
+
+    xywh = boxes.copy()
+    xywh[:, 2:] -= xywh[:, :2]
+    if per_class_nms:
+        indices = cv2.dnn.NMSBoxesBatched(xywh, confidences, class_ids, 0.0, nms_threshold)
+    else:
+        indices = cv2.dnn.NMSBoxes(xywh, confidences, 0.0, nms_threshold)
+    indices = np.asarray(indices, dtype=int).flatten()
+    return (list(boxes[indices].round().astype(np.int32)), class_ids[indices].tolist(),
+            confidences[indices].tolist())
@@ -0,0 +1,146 @@
+import cv2
+import numpy as np
+
+# Alpha-beta filter gains: the steady-state form of a constant-velocity Kalman filter
+POSITION_GAIN = 0.7
+VELOCITY_GAIN = 0.3
+THUMBNAIL_SIZE = (32, 24)  # (width, height) used for scene change detection
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of (N, 4) and (M, 4) arrays of (x1, y1, x2, y2) boxes"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0)
+
+
+class Track:
+    """One tracked object with a constant-velocity box estimate"""
+
+    def __init__(self, track_id, box, class_id, confidence):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)  # per frame
+        self.class_id = class_id
+        self.confidence = confidence
+        self.misses = 0
+        self.steps = 0  # frames predicted since the last detection
+
+    def predict(self):
+        self.box = self.box + self.velocity
+        self.steps += 1
+
+    def correct(self, box, confidence):
+        residual = np.asarray(box, dtype=np.float32) - self.box
+        self.box = self.box + POSITION_GAIN * residual
+        self.velocity = self.velocity + VELOCITY_GAIN * residual / max(self.steps, 1)
+        self.confidence = confidence
+        self.misses = 0
+        self.steps = 0
+
+
+class Tracker:
+    """Propagates detections between keyframes and keeps stable track IDs
+
+    Full detection is only needed every keyframe_interval frames or when
+    the scene changes (mean absolute difference of a small grayscale
+    thumbnail against the last keyframe above scene_threshold, in 0-255
+    levels). Detections are matched to predicted tracks greedily by IoU
+    within the same class; tracks unmatched for more than max_misses
+    keyframes are dropped. Boxes are kept in original frame coordinates.
+    """
+
+    def __init__(self, keyframe_interval=5, iou_threshold=0.3, max_misses=2, scene_threshold=20):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.scene_threshold = scene_threshold
+        self.tracks = []
+        self._next_id = 1
+        self._since_keyframe = None  # None until the first detection
+        self._thumbnail = None
+
+    @staticmethod
+    def _make_thumbnail(image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def needs_detection(self, image):
+        """Whether this frame should run full detection"""
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            return True
+        if self._thumbnail is None:
+            return False
+        thumbnail = self._make_thumbnail(image)
+        return float(np.abs(thumbnail - self._thumbnail).mean()) > self.scene_threshold
+
+    def update(self, detections, scale=1.0, image=None):
+        """Match fresh detections to tracks; returns (detections, track_ids)
+
+        detections were found on a frame downscaled by scale; image is that
+        frame, kept as the reference for scene change detection.
+        """
+        boxes, class_ids, confidences = detections
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) / scale
+        for track in self.tracks:
+            track.predict()
+
+        unmatched = set(range(len(boxes)))
+        if self.tracks and len(boxes):
+            track_boxes = np.array([track.box for track in self.tracks])
+            ious = iou_matrix(track_boxes, boxes)
+            track_classes = np.array([track.class_id for track in self.tracks])
+            ious[track_classes[:, None] != np.asarray(class_ids)[None, :]] = 0
+
+            matched_tracks = set()
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, ious.shape)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d not in unmatched:
+                    continue
+                self.tracks[t].correct(boxes[d], confidences[d])
+                matched_tracks.add(t)
+                unmatched.discard(d)
+            for t, track in enumerate(self.tracks):
+                if t not in matched_tracks:
+                    track.misses += 1
+        else:
+            for track in self.tracks:
+                track.misses += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for d in sorted(unmatched):
+            self.tracks.append(Track(self._next_id, boxes[d], int(class_ids[d]), confidences[d]))
+            self._next_id += 1
+
+        self._since_keyframe = 0
+        if image is not None:
+            self._thumbnail = self._make_thumbnail(image)
+        return self.result()
+
+    def predict(self):
+        """Advance all tracks one frame without detection; returns (detections, track_ids)"""
+        for track in self.tracks:
+            track.predict()
+        if self._since_keyframe is not None:
+            self._since_keyframe += 1
+        return self.result()
+
+    def result(self):
+        """Tracks seen at the last keyframe as ((boxes, class_ids, confidences), track_ids)"""
+        visible = [track for track in self.tracks if track.misses == 0]
+        detections = (
+            [track.box.copy() for track in visible],
+            [track.class_id for track in visible],
+            [track.confidence for track in visible],
+        )
+        return detections, [track.id for track in visible]
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+
+class UploadError(ValueError):
+    """Raised for requests without a usable file upload"""
+
+
+def safe_filename(filename, default="upload"):
+    """Base name of an uploaded file, without leading dots"""
+    return Path(filename or "").name.lstrip(".") or default
+
+
+def stored_name(filename):
+    """Name an upload is stored under in its request directory
+
+    The fixed stem keeps an upload from overwriting the request's own files
+    (result.json, video.json, outputs), whatever it was called.
+    """
+    return f"original{Path(filename).suffix.lower()}"
+
+
+class _FilePartWriter:
+    """Multipart callbacks that write one file field to a directory"""
+
+    def __init__(self, directory, field):
+        self.directory = Path(directory)
+        self.field = field
+        self.filename = None
+        self.size = 0
+        self._file = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        if name == self.field and filename and self.filename is None:
+            self.filename = safe_filename(filename)
+            self._file = (self.directory / stored_name(self.filename)).open("wb")
+
+    def on_part_data(self, data, start, end):
+        if self._file is not None:
+            self._file.write(data[start:end])
+            self.size += end - start
+
+    def on_part_end(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+async def stream_upload(request, directory, field="file"):
+    """Write the file field of a multipart/form-data request straight to directory
+
+    The body is parsed as it arrives, so the upload is never held in memory
+    or copied out of a spooled temporary file. The file is stored under
+    stored_name(filename). Returns (filename, size).
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    writer = _FilePartWriter(directory, field)
+    parser = multipart.MultipartParser(boundary, writer.callbacks())
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(parser.write, chunk)
+        parser.finalize()
+    finally:
+        writer.close()
+    if writer.filename is None:
+        raise UploadError(f"No file in form field '{field}'")
+    return writer.filename, writer.size
@@ -1,27 +1,53 @@
+import os
 from pathlib import Path
 import cv2
 import logging
 
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+# File signatures of the supported formats
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',          # JPEG
+    b'\x89PNG\r\n\x1a\n',     # PNG
+    b'BM',                    # BMP
+)
+
 def is_valid_image(image_path):
-    """Check if the image is valid and can be opened"""
+    """Check the file header for a supported image format without decoding it"""
     try:
-        img = cv2.imread(str(image_path))
-        return img is not None
+        with open(image_path, 'rb') as f:
+            header = f.read(8)
+        return header.startswith(IMAGE_SIGNATURES)
     except Exception:
         return False
 
-def get_image_files(directory):
-    """Get all valid image files from the specified directory"""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
-    directory = Path(directory)
-    files = []
-    for f in directory.glob('*'):
-        if f.suffix.lower() in image_extensions and is_valid_image(f):
-            files.append(f)
+def _walk_files(directory, recursive):
+    """Yield file paths below directory without building a list"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _walk_files(entry.path, recursive)
+            elif entry.is_file():
+                yield Path(entry.path)
+
+def iter_image_files(directory, recursive=False):
+    """Lazily yield valid image files from the specified directory
+
+    Files are validated from their header only; pixels are decoded once,
+    by whoever consumes the paths.
+    """
+    for f in _walk_files(Path(directory), recursive):
+        if f.suffix.lower() in IMAGE_EXTENSIONS and is_valid_image(f):
+            yield f
         else:
             logger.warning(f"Skipping invalid or unsupported image: {f}")
+
+def get_image_files(directory, recursive=False):
+    """Get all valid image files from the specified directory"""
+    files = list(iter_image_files(directory, recursive))
     logger.info(f"Found {len(files)} valid images in {directory}")
     return files
 
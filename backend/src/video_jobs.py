@@ -0,0 +1,264 @@
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+import pipeline
+from inference_pool import PoolFullError
+from metrics import stage
+from model_registry import get_classes
+from rendering import draw_detections
+from uploads import stored_name
+
+logger = logging.getLogger(__name__)
+
+VIDEO_STATUS_FILENAME = "video.json"
+_END = object()  # marks the end of a stage's output
+
+
+def output_names(filename):
+    """Names of the annotated video and detections file for an uploaded video"""
+    stem = Path(filename).stem
+    return f"annotated_{stem}.mp4", f"{stem}_detections.jsonl"
+
+
+def _put(q, item, stop):
+    """Put into a bounded queue, giving up if the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """Get from a queue, returning _END if the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def process_video(video_path, output_dir, pool, model, input_size, stride=1, batch_size=4,
+                  max_in_flight=2, progress=None, cancel=None, filename=None, **options):
+    """Detect objects in every stride-th frame of a video
+
+    Decoding, detection and annotation/encoding run concurrently as three
+    stages joined by bounded queues, so memory does not grow with the
+    length of the video. Frames are read by one thread, sent to the
+    inference pool in batches of batch_size (at most max_in_flight batches
+    at a time) and written in order by another thread to an annotated video
+    and a JSONL file with one line of detections per processed frame. The
+    annotated video only holds the processed frames, at fps / stride.
+    progress is a dict updated as frames move through the pipeline; setting
+    the cancel event stops the job. Output files are named after filename
+    (default: the video's own name). Returns the output file names.
+    """
+    video_path, output_dir = Path(video_path), Path(output_dir)
+    video_name, records_name = output_names(filename or video_path.name)
+    classes = get_classes(model)
+    progress = progress if progress is not None else {}
+    stop = cancel or threading.Event()
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path.name}")
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    progress.update(frames_total=int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None,
+                    frames_read=0, frames_processed=0, source_fps=source_fps, stride=stride)
+
+    frames = queue.Queue(maxsize=batch_size * 2)  # (index, frame)
+    batches = queue.Queue(maxsize=max_in_flight)  # (future, indices, frames)
+    errors = []
+
+    def read():
+        index = 0
+        try:
+            while not stop.is_set():
+                # Skipped frames are only grabbed, not converted
+                if index % stride:
+                    if not capture.grab():
+                        break
+                    index += 1
+                    continue
+                with stage("decode"):
+                    ok, frame = capture.read()
+                if not ok:
+                    break
+                progress["frames_read"] += 1
+                if not _put(frames, (index, frame), stop):
+                    break
+                index += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            capture.release()
+            _put(frames, _END, stop)
+
+    def write():
+        partial_video = output_dir / f".{video_name}"
+        partial_records = output_dir / f".{records_name}"
+        writer = None
+        started = time.perf_counter()
+        try:
+            with partial_records.open("w") as records:
+                while True:
+                    item = _get(batches, stop)
+                    if item is _END:
+                        break
+                    future, indices, images = item
+                    for index, image, detections in zip(indices, images, future.result()):
+                        if writer is None:
+                            height, width = image.shape[:2]
+                            writer = cv2.VideoWriter(str(partial_video),
+                                                     cv2.VideoWriter_fourcc(*"mp4v"),
+                                                     source_fps / stride, (width, height))
+                        boxes, class_ids, confidences = detections
+                        with stage("annotate"):
+                            draw_detections(image, boxes, class_ids, confidences, classes)
+                        with stage("encode"):
+                            writer.write(image)
+                        records.write(json.dumps({
+                            "frame": index,
+                            "time": round(index / source_fps, 3),
+                            "detections": pipeline.detections_to_json(detections, classes),
+                        }) + "\n")
+                        progress["frames_processed"] += 1
+                        progress["fps"] = round(
+                            progress["frames_processed"] / (time.perf_counter() - started), 2)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def submit(images):
+        # Wait for room in the inference queue rather than failing the job
+        while True:
+            try:
+                return pool.submit(pipeline.detect_batch, images, [options] * len(images),
+                                   input_size, model=model)
+            except PoolFullError:
+                if stop.wait(0.05):
+                    return None
+
+    reader = threading.Thread(target=read, name="video-read", daemon=True)
+    writer_thread = threading.Thread(target=write, name="video-write", daemon=True)
+    reader.start()
+    writer_thread.start()
+
+    indices, images = [], []
+    while True:
+        item = _get(frames, stop)
+        if item is not _END:
+            indices.append(item[0])
+            images.append(item[1])
+        if images and (item is _END or len(images) >= batch_size):
+            future = submit(images)
+            if future is None or not _put(batches, (future, indices, images), stop):
+                break
+            indices, images = [], []
+        if item is _END:
+            break
+    _put(batches, _END, stop)
+
+    reader.join()
+    writer_thread.join()
+    if errors:
+        raise errors[0]
+    if cancel is not None and cancel.is_set():
+        raise RuntimeError("Video processing was cancelled")
+
+    for name in (video_name, records_name):
+        partial = output_dir / f".{name}"
+        if partial.exists():
+            partial.replace(output_dir / name)
+    return video_name, records_name
+
+
+class VideoJobs:
+    """Run video detection jobs in the background and report their progress
+
+    Each job lives in its request directory next to the uploaded video;
+    its final status is written to video.json so it can still be reported
+    after a restart.
+    """
+
+    def __init__(self, store, pool, workers=1, batch_size=4):
+        self.store = store
+        self.pool = pool
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video")
+        self._jobs = {}  # request_id -> (Future, progress dict, cancel Event)
+        self._lock = threading.Lock()
+
+    def submit(self, request_id, filename, model, input_size, stride=1, **options):
+        """Start processing an uploaded video stored in the request directory"""
+        progress = {"status": "pending", "filename": filename, "model": model, "stride": stride}
+        cancel = threading.Event()
+        with self._lock:
+            future = self._executor.submit(self._run, request_id, filename, model, input_size,
+                                           stride, progress, cancel, options)
+            self._jobs[request_id] = (future, progress, cancel)
+        return future
+
+    def _run(self, request_id, filename, model, input_size, stride, progress, cancel, options):
+        request_dir = self.store.path(request_id)
+        progress["status"] = "running"
+        started = time.perf_counter()
+        try:
+            video_name, records_name = process_video(
+                request_dir / stored_name(filename), request_dir, self.pool, model, input_size,
+                stride, self.batch_size, progress=progress, cancel=cancel, filename=filename,
+                **options)
+            progress.update(status="done", video_filename=video_name, detections_filename=records_name)
+        except Exception as e:
+            logger.error(f"Video job {request_id} failed: {e}")
+            progress.update(status="failed", error=str(e))
+        progress["elapsed"] = round(time.perf_counter() - started, 2)
+        if request_dir.exists():
+            (request_dir / VIDEO_STATUS_FILENAME).write_text(json.dumps(progress))
+            self.store.refresh(request_id)
+        with self._lock:
+            if self._jobs.get(request_id, (None, progress))[1] is progress:
+                self._jobs.pop(request_id, None)
+
+    def status(self, request_id):
+        """Progress of a video job: pending, running, done, failed or not_found"""
+        with self._lock:
+            job = self._jobs.get(request_id)
+        if job is not None:
+            return {"request_id": request_id, **job[1]}
+        status_path = self.store.path(request_id) / VIDEO_STATUS_FILENAME
+        if status_path.exists():
+            return {"request_id": request_id, **json.loads(status_path.read_text())}
+        return {"request_id": request_id, "status": "not_found"}
+
+    def active(self, request_id):
+        """Whether a video job for the request is pending or running"""
+        with self._lock:
+            return request_id in self._jobs
+
+    def forget(self, request_id):
+        """Cancel a job whose files are being removed and drop its state"""
+        with self._lock:
+            job = self._jobs.pop(request_id, None)
+        if job is not None:
+            job[2].set()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for _, _, cancel in self._jobs.values():
+                cancel.set()
+        self._executor.shutdown(wait=wait)
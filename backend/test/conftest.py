@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Modules in src/ import each other by their plain names
+backend_dir = Path(__file__).parent.parent
+sys.path[:0] = [str(backend_dir), str(backend_dir / "src")]
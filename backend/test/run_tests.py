@@ -6,9 +6,11 @@ import datetime
 import json
 from typing import Dict, List
 
-# Add the project root directory to Python path
+# Add the project root directory to Python path, and src/ since its modules
+# import each other by their plain names
 backend_dir = Path(__file__).parent.parent
 sys.path.append(str(backend_dir))
+sys.path.append(str(backend_dir / "src"))
 
 class TestReport:
     def __init__(self):
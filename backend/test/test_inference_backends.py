@@ -0,0 +1,106 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from object_detection import ObjectDetector
+
+try:
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:
+    onnx = None
+
+CLASSES = ["person", "car", "dog"]
+
+
+def write_yolo_like_model(path, seed=0):
+    """A small ONNX network with YOLO-style output rows for comparing backends
+
+    A strided convolution followed by a sigmoid turns each 8x8 cell of the
+    input into a row (center_x, center_y, w, h, objectness, class scores).
+    """
+    rng = np.random.default_rng(seed)
+    channels = 5 + len(CLASSES)
+    weights = rng.normal(0, 0.05, (channels, 3, 8, 8)).astype(np.float32)
+    bias = rng.normal(0, 0.5, channels).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["images", "weights", "bias"], ["features"],
+                             kernel_shape=[8, 8], strides=[8, 8]),
+            helper.make_node("Sigmoid", ["features"], ["scores"]),
+            helper.make_node("Reshape", ["scores", "shape"], ["rows_by_channel"]),
+            helper.make_node("Transpose", ["rows_by_channel"], ["output"], perm=[0, 2, 1]),
+        ],
+        "yolo_like",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, "height", "width"])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", None, channels])],
+        [numpy_helper.from_array(weights, "weights"), numpy_helper.from_array(bias, "bias"),
+         numpy_helper.from_array(np.array([0, channels, -1], dtype=np.int64), "shape")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+@unittest.skipIf(onnx is None, "onnx and onnxruntime are required for backend parity tests")
+class TestInferenceBackendParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        models_dir = Path(cls.temp_dir.name)
+        (models_dir / "coco.names").write_text("\n".join(CLASSES) + "\n")
+        write_yolo_like_model(models_dir / "parity.onnx")
+        quantize_dynamic(str(models_dir / "parity.onnx"), str(models_dir / "parity.int8.onnx"),
+                         weight_type=QuantType.QInt8)
+        cls.detectors = {backend: ObjectDetector("parity", models_dir, backend=backend, threads=1)
+                         for backend in ["opencv", "onnxruntime", "onnxruntime-int8"]}
+
+        rng = np.random.default_rng(1)
+        cls.images = [rng.integers(0, 255, (240, 320, 3), dtype=np.uint8) for _ in range(2)]
+        cls.blob = np.random.default_rng(2).random((2, 3, 64, 64), dtype=np.float32)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def forward(self, backend):
+        return [out.reshape(len(self.blob), -1, out.shape[-1])
+                for out in self.detectors[backend].backend.forward(self.blob)]
+
+    def test_onnxruntime_outputs_match_opencv(self):
+        for expected, actual in zip(self.forward("opencv"), self.forward("onnxruntime")):
+            np.testing.assert_allclose(actual, expected, atol=1e-4)
+
+    def test_int8_outputs_close_to_float(self):
+        for expected, actual in zip(self.forward("onnxruntime"), self.forward("onnxruntime-int8")):
+            self.assertLess(np.abs(actual - expected).mean(), 0.01)
+            np.testing.assert_allclose(actual, expected, atol=0.05)
+
+    def test_onnxruntime_session_shared(self):
+        models_dir = Path(self.temp_dir.name)
+        other = ObjectDetector("parity", models_dir, backend="onnxruntime", threads=1)
+        self.assertIs(other.backend.session, self.detectors["onnxruntime"].backend.session)
+        self.assertIsNot(self.detectors["onnxruntime-int8"].backend.session, other.backend.session)
+
+    def test_detections_agree(self):
+        options = [{"conf_threshold": 0.3}] * len(self.images)
+        results = {backend: detector.detect_objects_batch(self.images, options, input_size=128)
+                   for backend, detector in self.detectors.items()
+                   if backend != "onnxruntime-int8"}
+        for (boxes, class_ids, confidences), (other_boxes, other_class_ids, other_confidences) \
+                in zip(results["opencv"], results["onnxruntime"]):
+            self.assertEqual(class_ids, other_class_ids)
+            np.testing.assert_allclose(np.array(boxes).reshape(-1, 4),
+                                       np.array(other_boxes).reshape(-1, 4), atol=1)
+            np.testing.assert_allclose(confidences, other_confidences, atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tiling import merge_detections, tile_grid, tile_offsets
+
+
+def sorted_boxes(boxes):
+    return sorted(np.asarray(box).tolist() for box in boxes)
+
+
+class TestTileGrid(unittest.TestCase):
+    def test_offsets(self):
+        self.assertEqual(tile_offsets(100, 416, 0.2), [0])
+        self.assertEqual(tile_offsets(416, 416, 0.2), [0])
+        self.assertEqual(tile_offsets(1000, 400, 0.2), [0, 320, 600])
+
+    def test_last_tile_flush_with_end(self):
+        for length in (417, 500, 1000, 1999):
+            offsets = tile_offsets(length, 416, 0.25)
+            self.assertEqual(offsets[-1] + 416, length)
+            self.assertEqual(offsets, sorted(set(offsets)))
+
+    def test_grid_covers_image(self):
+        for height, width, tile_size, overlap in [(720, 1280, 416, 0.2), (1000, 300, 256, 0.5),
+                                                  (3000, 4000, 608, 0.0)]:
+            covered = np.zeros((height, width), dtype=bool)
+            for x, y in tile_grid(height, width, tile_size, overlap):
+                self.assertTrue(0 <= x <= width - tile_size and 0 <= y <= height - tile_size)
+                covered[y:y + tile_size, x:x + tile_size] = True
+            self.assertTrue(covered.all())
+
+
+class TestMergeDetections(unittest.TestCase):
+    # Two tiles of a 1000x500 image sharing the strip 400..600
+    LEFT, RIGHT = (0, 0, 600, 500), (400, 0, 1000, 500)
+
+    def test_nested_objects_kept(self):
+        boxes, class_ids, confidences = merge_detections(
+            [[0, 0, 1000, 1000], [100, 100, 150, 200], [300, 300, 350, 400]],
+            [0, 0, 0], [0.6, 0.9, 0.8])
+        self.assertEqual(sorted_boxes(boxes),
+                         [[0, 0, 1000, 1000], [100, 100, 150, 200], [300, 300, 350, 400]])
+        np.testing.assert_allclose(sorted(confidences), [0.6, 0.8, 0.9])
+
+    def test_whole_image_boxes_not_joined(self):
+        boxes, _, _ = merge_detections(
+            [[0, 0, 1000, 500], [420, 100, 600, 300], [500, 150, 560, 250]],
+            [0, 0, 0], [0.6, 0.9, 0.8], tiles=[None, self.LEFT, self.RIGHT],
+            image_size=(1000, 500))
+        self.assertEqual(sorted_boxes(boxes),
+                         [[0, 0, 1000, 500], [420, 100, 600, 300], [500, 150, 560, 250]])
+
+    def test_object_across_border_joined(self):
+        boxes, class_ids, confidences = merge_detections(
+            [[300, 100, 600, 300], [400, 105, 700, 295]], [2, 2], [0.7, 0.8],
+            tiles=[self.LEFT, self.RIGHT], image_size=(1000, 500))
+        self.assertEqual(sorted_boxes(boxes), [[300, 100, 700, 300]])
+        self.assertEqual(class_ids, [2])
+        np.testing.assert_allclose(confidences, [0.8])
+
+    def test_parts_past_border_joined(self):
+        for overshoot in (0, 3, 10, 40):
+            boxes, _, _ = merge_detections(
+                [[300, 100, 600 + overshoot, 300], [400 - overshoot, 105, 700, 295]], [0, 0],
+                [0.7, 0.8], tiles=[self.LEFT, self.RIGHT], image_size=(1000, 500))
+            self.assertEqual(sorted_boxes(boxes), [[300, 100, 700, 300]], overshoot)
+
+    def test_parts_need_different_tiles_and_class(self):
+        tiles = [self.LEFT, self.RIGHT]
+        boxes, _, _ = merge_detections([[300, 100, 600, 300], [400, 105, 700, 295]], [1, 2],
+                                       [0.7, 0.8], per_class_nms=True, tiles=tiles,
+                                       image_size=(1000, 500))
+        self.assertEqual(len(boxes), 2)
+
+        # Both boxes end at the same border of the same tile: two objects side by side
+        boxes, _, _ = merge_detections([[300, 0, 600, 100], [450, 200, 600, 300]], [0, 0],
+                                       [0.7, 0.8], tiles=[self.LEFT, self.LEFT],
+                                       image_size=(1000, 500))
+        self.assertEqual(len(boxes), 2)
+
+    def test_image_border_is_not_a_cut(self):
+        boxes, _, _ = merge_detections(
+            [[0, 100, 200, 300], [900, 100, 1000, 300]], [0, 0], [0.7, 0.8],
+            tiles=[self.LEFT, self.RIGHT], image_size=(1000, 500))
+        self.assertEqual(sorted_boxes(boxes), [[0, 100, 200, 300], [900, 100, 1000, 300]])
+
+    def test_empty(self):
+        self.assertEqual(merge_detections([], [], [], tiles=[], image_size=(10, 10)),
+                         ([], [], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
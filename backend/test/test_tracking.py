@@ -0,0 +1,106 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tracking import Track, Tracker, iou_matrix
+
+
+def detections(*objects):
+    """(boxes, class_ids, confidences) from (box, class_id) pairs"""
+    return ([box for box, _ in objects], [class_id for _, class_id in objects],
+            [0.9] * len(objects))
+
+
+class TestIouMatrix(unittest.TestCase):
+    def test_values(self):
+        ious = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+        np.testing.assert_allclose(ious, [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+
+class TestTrack(unittest.TestCase):
+    def test_alpha_beta_update(self):
+        track = Track(1, [0, 0, 10, 10], 0, 0.9)
+        track.predict()
+        track.correct([10, 0, 20, 10], 0.8)
+        np.testing.assert_allclose(track.box, [7, 0, 17, 10])
+        np.testing.assert_allclose(track.velocity, [3, 0, 3, 0])
+        self.assertEqual((track.misses, track.steps, track.confidence), (0, 0, 0.8))
+
+        track.predict()
+        np.testing.assert_allclose(track.box, [10, 0, 20, 10])
+
+
+class TestTracker(unittest.TestCase):
+    def test_stable_ids_across_keyframes(self):
+        tracker = Tracker()
+        _, first_ids = tracker.update(detections(([0, 0, 50, 50], 0), ([100, 100, 150, 150], 1)))
+        _, ids = tracker.update(detections(([104, 102, 154, 152], 1), ([3, 2, 53, 52], 0)))
+        self.assertEqual(first_ids, [1, 2])
+        self.assertEqual(sorted(ids), [1, 2])
+        _, class_ids, _ = tracker.result()[0]
+        self.assertEqual(dict(zip(ids, class_ids)), {1: 0, 2: 1})
+
+    def test_new_id_for_unmatched_detection(self):
+        tracker = Tracker()
+        tracker.update(detections(([0, 0, 50, 50], 0)))
+        _, ids = tracker.update(detections(([0, 0, 50, 50], 0), ([200, 200, 250, 250], 0)))
+        self.assertEqual(ids, [1, 2])
+
+    def test_no_cross_class_match(self):
+        tracker = Tracker()
+        tracker.update(detections(([0, 0, 50, 50], 0)))
+        _, ids = tracker.update(detections(([0, 0, 50, 50], 1)))
+        self.assertEqual(ids, [2])
+        self.assertEqual([track.id for track in tracker.tracks], [1, 2])
+
+    def test_track_dropped_after_max_misses(self):
+        tracker = Tracker(max_misses=2)
+        tracker.update(detections(([0, 0, 50, 50], 0)))
+        for _ in range(2):
+            _, ids = tracker.update(detections())
+            self.assertEqual(ids, [])  # missed tracks are kept but not reported
+            self.assertEqual([track.id for track in tracker.tracks], [1])
+        tracker.update(detections())
+        self.assertEqual(tracker.tracks, [])
+
+    def test_missed_track_recovers_its_id(self):
+        tracker = Tracker(max_misses=2)
+        tracker.update(detections(([0, 0, 50, 50], 0)))
+        tracker.update(detections())
+        _, ids = tracker.update(detections(([2, 0, 52, 50], 0)))
+        self.assertEqual(ids, [1])
+
+    def test_scaled_detections_in_frame_coordinates(self):
+        tracker = Tracker()
+        (boxes, _, _), _ = tracker.update(detections(([10, 10, 20, 20], 0)), scale=0.5)
+        np.testing.assert_allclose(boxes[0], [20, 20, 40, 40])
+
+    def test_needs_detection_on_interval(self):
+        tracker = Tracker(keyframe_interval=3)
+        image = np.zeros((48, 64, 3), dtype=np.uint8)
+        self.assertTrue(tracker.needs_detection(image))  # nothing detected yet
+        tracker.update(detections(([0, 0, 10, 10], 0)), image=image)
+        decisions = []
+        for _ in range(6):
+            needed = tracker.needs_detection(image)
+            decisions.append(needed)
+            if needed:
+                tracker.update(detections(([0, 0, 10, 10], 0)), image=image)
+            else:
+                tracker.predict()
+        self.assertEqual(decisions, [False, False, True, False, False, True])
+
+    def test_needs_detection_on_scene_change(self):
+        tracker = Tracker(keyframe_interval=100, scene_threshold=20)
+        dark = np.zeros((48, 64, 3), dtype=np.uint8)
+        tracker.update(detections(), image=dark)
+        self.assertFalse(tracker.needs_detection(dark + 10))
+        self.assertTrue(tracker.needs_detection(np.full_like(dark, 200)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,9 @@ import {
   CircularProgress,
 } from '@mui/material';
 import { Videocam, VideocamOff } from '@mui/icons-material';
-import axios from 'axios';
+import { getFrameSocketUrl } from '../services/api';
+
+const SEND_INTERVAL_MS = 100;
 
 const CameraView = () => {
   const videoRef = useRef(null);
@@ -17,6 +19,9 @@ const CameraView = () => {
   const [isProcessing, setIsProcessing] = useState(false);
   const [loading, setLoading] = useState(true);
   const processingRef = useRef(false);
+  const socketRef = useRef(null);
+  const detectionsRef = useRef(null);
+  const classesRef = useRef([]);
 
   useEffect(() => {
     // Check if camera is available
@@ -37,54 +42,82 @@ const CameraView = () => {
     };
   }, []);
 
-  const processFrame = async (canvas) => {
+  const drawFrame = (canvas) => {
     if (!processingRef.current) return;
 
-    try {
-      // Draw the current video frame to canvas first
-      const video = videoRef.current;
-      const ctx = canvas.getContext('2d');
-      ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-
-      // Add moderate delay to ensure stable processing
-      await new Promise(resolve => setTimeout(resolve, 200));
-
-      // Convert canvas to blob
-      const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.8));
-      const formData = new FormData();
-      formData.append('file', blob, 'frame.jpg');
-
-      // Send to backend
-      const response = await axios.post('http://localhost:8000/process-frame/', formData, {
-        responseType: 'blob',
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-        timeout: 10000  // 10 second timeout
+    // Draw the current video frame, then the latest detections on top
+    const video = videoRef.current;
+    const ctx = canvas.getContext('2d');
+    ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+
+    const result = detectionsRef.current;
+    if (result && result.width && result.height) {
+      const sx = canvas.width / result.width;
+      const sy = canvas.height / result.height;
+      ctx.font = '16px Arial';
+      ctx.lineWidth = 2;
+      result.boxes.forEach(([x1, y1, x2, y2], i) => {
+        const label = `${classesRef.current[result.class_ids[i]] || result.class_ids[i]}: ${result.scores[i].toFixed(2)}`;
+        ctx.strokeStyle = '#00ff00';
+        ctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+        const textWidth = ctx.measureText(label).width;
+        ctx.fillStyle = 'white';
+        ctx.fillRect(x1 * sx + 3, y1 * sy + 3, textWidth + 4, 20);
+        ctx.fillStyle = 'black';
+        ctx.fillText(label, x1 * sx + 5, y1 * sy + 18);
       });
+    }
 
-      // Display processed frame
-      const imageUrl = URL.createObjectURL(response.data);
-      const img = new Image();
-      img.onload = () => {
-        const ctx = canvas.getContext('2d');
-        ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
-        URL.revokeObjectURL(imageUrl);
-        
-        // Process next frame
-        if (processingRef.current) {
-          // Add delay between frames for more stable processing
-          setTimeout(() => processFrame(canvas), 200);
-        }
-      };
-      img.src = imageUrl;
-
-    } catch (error) {
-      console.error('Error processing frame:', error);
-      if (processingRef.current) {
-        setTimeout(() => processFrame(canvas), 1000);  // Longer delay on error to recover
+    requestAnimationFrame(() => drawFrame(canvas));
+  };
+
+  const sendFrames = (socket) => {
+    // Capture frames from a separate canvas so drawn boxes are not sent back
+    const capture = document.createElement('canvas');
+
+    const sendNext = () => {
+      if (!processingRef.current || socket.readyState !== WebSocket.OPEN) return;
+
+      const video = videoRef.current;
+      capture.width = video.videoWidth;
+      capture.height = video.videoHeight;
+      capture.getContext('2d').drawImage(video, 0, 0);
+
+      // Skip this tick if the previous frame is still being sent
+      if (socket.bufferedAmount === 0) {
+        capture.toBlob(blob => {
+          if (blob && socket.readyState === WebSocket.OPEN) {
+            socket.send(blob);
+          }
+        }, 'image/jpeg', 0.8);
       }
-    }
+      setTimeout(sendNext, SEND_INTERVAL_MS);
+    };
+
+    sendNext();
+  };
+
+  const openSocket = (canvas) => {
+    const socket = new WebSocket(getFrameSocketUrl());
+    socketRef.current = socket;
+
+    socket.onopen = () => sendFrames(socket);
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'classes') {
+        classesRef.current = message.classes;
+      } else if (message.type === 'detections') {
+        detectionsRef.current = message;
+      } else if (message.type === 'error') {
+        console.error('Error processing frame:', message.error);
+      }
+    };
+    socket.onclose = () => {
+      // Reconnect after a short delay if the camera is still running
+      if (processingRef.current && socketRef.current === socket) {
+        setTimeout(() => processingRef.current && openSocket(canvas), 1000);
+      }
+    };
   };
 
   const startCamera = async () => {
@@ -112,7 +145,8 @@ const CameraView = () => {
           setIsStreaming(true);
           processingRef.current = true;
           setIsProcessing(true);
-          processFrame(canvas);
+          openSocket(canvas);
+          drawFrame(canvas);
         };
       }
     } catch (err) {
@@ -124,6 +158,13 @@ const CameraView = () => {
   const stopCamera = () => {
     processingRef.current = false;
     setIsProcessing(false);
+    detectionsRef.current = null;
+
+    if (socketRef.current) {
+      const socket = socketRef.current;
+      socketRef.current = null;
+      socket.close();
+    }
     
     if (videoRef.current && videoRef.current.srcObject) {
       const tracks = videoRef.current.srcObject.getTracks();
@@ -9,6 +9,53 @@ export const processImage = async (file) => {
   return response.data;
 };
 
+// Uploads many images in one request. Results arrive as NDJSON, one line per
+// image in completion order, and are passed to onResult as they come in; the
+// final summary line carries the request id and PDF name when report is set.
+export const processImages = async (files, { report = false, onResult } = {}) => {
+  const formData = new FormData();
+  files.forEach((file) => formData.append('files', file));
+  const response = await fetch(`${API_BASE_URL}/process-images/?report=${report}`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (!response.ok) {
+    throw new Error(`Batch upload failed with status ${response.status}`);
+  }
+
+  const results = [];
+  let summary = null;
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const item = JSON.parse(line);
+    if (item.done) {
+      summary = item;
+    } else if (item.index === undefined) {
+      throw new Error(item.error);
+    } else {
+      results.push(item);
+      if (onResult) onResult(item);
+    }
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+  return { results, summary };
+};
+
+export const getFrameSocketUrl = () =>
+  `${API_BASE_URL.replace(/^http/, 'ws')}/ws/frames`;
+
 export const getDownloadUrl = (requestId, filename) => 
   `${API_BASE_URL}/download/${requestId}/${filename}`;
 